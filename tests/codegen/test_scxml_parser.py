@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Regression tests for tools/codegen/scxml_parser.py
+
+Run with: python3 -m unittest test_scxml_parser (from tests/codegen)
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tools', 'codegen'))
+
+from scxml_parser import SCXMLParser  # noqa: E402
+
+
+def _wide_state_document(n: int) -> str:
+    """One compound state with n transitions followed by n child states"""
+    transitions = ''.join(f'<transition event="e{i}" target="c{i}"/>' for i in range(n))
+    children = ''.join(f'<state id="c{i}"/>' for i in range(n))
+    return ('<scxml xmlns="http://www.w3.org/2005/07/scxml" version="1.0" initial="p">'
+            f'<state id="p">{transitions}{children}</state></scxml>')
+
+
+class StreamingParseTest(unittest.TestCase):
+    """The streaming pass in _parse_document must stay linear in sibling count"""
+
+    def _parse_seconds(self, directory: str, n: int) -> float:
+        path = os.path.join(directory, f'wide{n}.scxml')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(_wide_state_document(n))
+
+        start = time.perf_counter()
+        model = SCXMLParser().parse_file(path)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(len(model.states), n + 1)
+        self.assertEqual(len(model.states['p'].transitions), n)
+        self.assertEqual(model.state_children['p'], [f'c{i}' for i in range(n)])
+        return elapsed
+
+    def test_wide_state_parses_in_linear_time(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self._parse_seconds(directory, 500)  # Warm up imports and regex caches
+            small = min(self._parse_seconds(directory, 2000) for _ in range(3))
+            large = min(self._parse_seconds(directory, 8000) for _ in range(3))
+
+        # 4x the siblings: linear is ~4x, quadratic ~16x; leave room for timer noise
+        self.assertLess(large, small * 8 + 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+"""Static CSS and SVG assets shared by the W3C test report generators"""
+
+# Report stylesheet, kept as a plain literal so braces need no escaping
+CSS = '''body{background:#f6f8fa;padding:24px}
+.container{max-width:1280px;margin:0 auto}
+.Box{background:white;border:1px solid #d0d7de;border-radius:6px;margin-bottom:16px}
+.Box-header{padding:16px;background:#f6f8fa;border-bottom:1px solid #d0d7de;border-radius:6px 6px 0 0}
+.Box-title{font-size:14px;font-weight:600;color:#24292f}
+.Box-body{padding:16px}
+.summary-grid{display:grid;grid-template-columns:repeat(auto-fit,minmax(200px,1fr));gap:16px;margin-bottom:24px}
+.counter{padding:16px;border:1px solid #d0d7de;border-radius:6px}
+.counter-label{font-size:12px;color:#57606a;font-weight:600;text-transform:uppercase}
+.counter-value{font-size:32px;font-weight:600;margin-top:8px}
+.counter.total{border-left:3px solid #0969da}
+.counter.total .counter-value{color:#0969da}
+.counter.pass{border-left:3px solid #1a7f37}
+.counter.pass .counter-value{color:#1a7f37}
+.counter.fail{border-left:3px solid #cf222e}
+.counter.fail .counter-value{color:#cf222e}
+.counter.error{border-left:3px solid #fb8500}
+.counter.error .counter-value{color:#fb8500}
+.pass-rate{font-size:20px;font-weight:600;color:#1a7f37;margin-bottom:16px}
+.octicon{display:inline-block;vertical-align:text-bottom;fill:currentColor}
+.State{display:inline-block;padding:4px 12px;font-size:12px;font-weight:500;line-height:20px;border-radius:2em}
+.State--success{color:#1a7f37;background-color:#dafbe1;border:1px solid #1a7f37}
+.State--failure{color:#cf222e;background-color:#ffebe9;border:1px solid #cf222e}
+.State--error{color:#9a6700;background-color:#fff8c5;border:1px solid #d4a72c}
+.Label{display:inline-block;padding:2px 7px;font-size:12px;font-weight:500;line-height:18px;border-radius:2em}
+.Label--primary{color:#0969da;background-color:#ddf4ff;border:1px solid #0969da}
+.Label--success{color:#1a7f37;background-color:#dafbe1;border:1px solid #1a7f37}
+.Label--warning{color:#9a6700;background-color:#fff8c5;border:1px solid #d4a72c}
+.Label--danger{color:#cf222e;background-color:#ffebe9;border:1px solid #cf222e}
+table{width:100%;border-collapse:collapse}
+th{padding:8px 16px;font-size:12px;font-weight:600;color:#57606a;text-align:left;background:#f6f8fa;border-bottom:1px solid #d0d7de}
+td{padding:8px 16px;font-size:14px;border-bottom:1px solid #d0d7de}
+tr:last-child td{border-bottom:0}
+.test-name{font-weight:600;color:#24292f}
+.time-value{font-family:ui-monospace,SFMono-Regular,SF Mono,Menlo,Consolas,Liberation Mono,monospace;font-size:12px;color:#57606a}
+.flash{padding:16px;margin-bottom:16px;border:1px solid transparent;border-radius:6px}
+.flash-error{color:#cf222e;background-color:#ffebe9;border-color:#cf8f91}
+'''
+
+# GitHub-style octicons for testcase status
+PASS_ICON = '''<svg class="octicon" style="color:#1a7f37" xmlns="http://www.w3.org/2000/svg" width="16" height="16" viewBox="0 0 16 16">
+<path d="M13.78 4.22a.75.75 0 0 1 0 1.06l-7.25 7.25a.75.75 0 0 1-1.06 0L2.22 9.28a.751.751 0 0 1 .018-1.042.751.751 0 0 1 1.042-.018L6 10.94l6.72-6.72a.75.75 0 0 1 1.06 0Z"></path>
+</svg>'''
+
+FAIL_ICON = '''<svg class="octicon" style="color:#cf222e" xmlns="http://www.w3.org/2000/svg" width="16" height="16" viewBox="0 0 16 16">
+<path d="M3.72 3.72a.75.75 0 0 1 1.06 0L8 6.94l3.22-3.22a.749.749 0 0 1 1.275.326.749.749 0 0 1-.215.734L9.06 8l3.22 3.22a.749.749 0 0 1-.326 1.275.749.749 0 0 1-.734-.215L8 9.06l-3.22 3.22a.751.751 0 0 1-1.042-.018.751.751 0 0 1-.018-1.042L6.94 8 3.72 4.78a.75.75 0 0 1 0-1.06Z"></path>
+</svg>'''
+
+ERROR_ICON = '''<svg class="octicon" style="color:#9a6700" xmlns="http://www.w3.org/2000/svg" width="16" height="16" viewBox="0 0 16 16">
+<path d="M6.457 1.047c.659-1.234 2.427-1.234 3.086 0l6.082 11.378A1.75 1.75 0 0 1 14.082 15H1.918a1.75 1.75 0 0 1-1.543-2.575Zm1.763.707a.25.25 0 0 0-.44 0L1.698 13.132a.25.25 0 0 0 .22.368h12.164a.25.25 0 0 0 .22-.368Zm.53 3.996v2.5a.75.75 0 0 1-1.5 0v-2.5a.75.75 0 0 1 1.5 0ZM9 11a1 1 0 1 1-2 0 1 1 0 0 1 2 0Z"></path>
+</svg>'''
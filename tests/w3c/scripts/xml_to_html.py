@@ -1,20 +1,42 @@
 #!/usr/bin/env python3
 """Convert W3C SCXML Test Results XML to HTML"""
-import xml.etree.ElementTree as ET
+import gzip
+import shutil
 import sys
+from html import escape
 
-def xml_to_html(xml_path, html_path):
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
+from report_assets import CSS, ERROR_ICON, FAIL_ICON, PASS_ICON
 
-    # Extract summary
-    total = int(root.get('tests', 0))
-    failures = int(root.get('failures', 0))
-    errors = int(root.get('errors', 0))
-    passed = total - failures - errors
-    pass_rate = (passed / total * 100) if total > 0 else 0
+try:
+    # libxml2-backed ElementTree API; skip ID bookkeeping the report never uses
+    # and only surface events for the tags the renderer dispatches on
+    from lxml import etree as ET
+    _ITERPARSE_OPTIONS = {
+        'huge_tree': True,
+        'collect_ids': False,
+        'tag': ('testsuites', 'testsuite', 'testcase'),
+        # Test output is untrusted: no entity expansion, DTD loading or
+        # network access, and no comment/PI nodes the report never reads
+        'resolve_entities': False,
+        'load_dtd': False,
+        'no_network': True,
+        'remove_comments': True,
+        'remove_pis': True,
+    }
+except ImportError:
+    # The stdlib TreeBuilder already drops comments/PIs and expat never
+    # fetches external entities
+    import xml.etree.ElementTree as ET
+    _ITERPARSE_OPTIONS = {}
 
-    html = f'''<!DOCTYPE html>
+# GitHub-style icon and State label class per testcase result
+_RESULT_STYLES = {
+    'PASS': (PASS_ICON, 'State--success'),
+    'FAIL': (FAIL_ICON, 'State--failure'),
+}
+_ERROR_STYLE = (ERROR_ICON, 'State--error')
+
+HEADER_TEMPLATE = '''<!DOCTYPE html>
 <html>
 <head>
 <meta charset="UTF-8">
@@ -22,44 +44,7 @@ def xml_to_html(xml_path, html_path):
 <title>W3C SCXML Test Results</title>
 <link href="https://unpkg.com/@primer/css@^20.2.4/dist/primer.css" rel="stylesheet" />
 <style>
-body{{background:#f6f8fa;padding:24px}}
-.container{{max-width:1280px;margin:0 auto}}
-.Box{{background:white;border:1px solid #d0d7de;border-radius:6px;margin-bottom:16px}}
-.Box-header{{padding:16px;background:#f6f8fa;border-bottom:1px solid #d0d7de;border-radius:6px 6px 0 0}}
-.Box-title{{font-size:14px;font-weight:600;color:#24292f}}
-.Box-body{{padding:16px}}
-.summary-grid{{display:grid;grid-template-columns:repeat(auto-fit,minmax(200px,1fr));gap:16px;margin-bottom:24px}}
-.counter{{padding:16px;border:1px solid #d0d7de;border-radius:6px}}
-.counter-label{{font-size:12px;color:#57606a;font-weight:600;text-transform:uppercase}}
-.counter-value{{font-size:32px;font-weight:600;margin-top:8px}}
-.counter.total{{border-left:3px solid #0969da}}
-.counter.total .counter-value{{color:#0969da}}
-.counter.pass{{border-left:3px solid #1a7f37}}
-.counter.pass .counter-value{{color:#1a7f37}}
-.counter.fail{{border-left:3px solid #cf222e}}
-.counter.fail .counter-value{{color:#cf222e}}
-.counter.error{{border-left:3px solid #fb8500}}
-.counter.error .counter-value{{color:#fb8500}}
-.pass-rate{{font-size:20px;font-weight:600;color:#1a7f37;margin-bottom:16px}}
-.octicon{{display:inline-block;vertical-align:text-bottom;fill:currentColor}}
-.State{{display:inline-block;padding:4px 12px;font-size:12px;font-weight:500;line-height:20px;border-radius:2em}}
-.State--success{{color:#1a7f37;background-color:#dafbe1;border:1px solid #1a7f37}}
-.State--failure{{color:#cf222e;background-color:#ffebe9;border:1px solid #cf222e}}
-.State--error{{color:#9a6700;background-color:#fff8c5;border:1px solid #d4a72c}}
-.Label{{display:inline-block;padding:2px 7px;font-size:12px;font-weight:500;line-height:18px;border-radius:2em}}
-.Label--primary{{color:#0969da;background-color:#ddf4ff;border:1px solid #0969da}}
-.Label--success{{color:#1a7f37;background-color:#dafbe1;border:1px solid #1a7f37}}
-.Label--warning{{color:#9a6700;background-color:#fff8c5;border:1px solid #d4a72c}}
-.Label--danger{{color:#cf222e;background-color:#ffebe9;border:1px solid #cf222e}}
-table{{width:100%;border-collapse:collapse}}
-th{{padding:8px 16px;font-size:12px;font-weight:600;color:#57606a;text-align:left;background:#f6f8fa;border-bottom:1px solid #d0d7de}}
-td{{padding:8px 16px;font-size:14px;border-bottom:1px solid #d0d7de}}
-tr:last-child td{{border-bottom:0}}
-.test-name{{font-weight:600;color:#24292f}}
-.time-value{{font-family:ui-monospace,SFMono-Regular,SF Mono,Menlo,Consolas,Liberation Mono,monospace;font-size:12px;color:#57606a}}
-.flash{{padding:16px;margin-bottom:16px;border:1px solid transparent;border-radius:6px}}
-.flash-error{{color:#cf222e;background-color:#ffebe9;border-color:#cf8f91}}
-</style>
+{css}</style>
 </head>
 <body>
 <div class="container">
@@ -101,16 +86,12 @@ Pass Rate: {pass_rate:.1f}%
 </div>
 '''
 
-    # Process each testsuite
-    for testsuite in root.findall('testsuite'):
-        suite_name = testsuite.get('name', '')
-        test_count = testsuite.get('tests', 0)
-
-        html += f'''
+# Fixed markup fragments, filled per suite/testcase with str.format
+SUITE_START_TEMPLATE = '''
 <div class="Box">
 <div class="Box-header">
-<h3 class="Box-title">{suite_name}</h3>
-<span class="Counter">{test_count}</span>
+<h3 class="Box-title">{name}</h3>
+<span class="Counter">{tests}</span>
 </div>
 <div class="Box-body" style="padding:0">
 <table>
@@ -126,56 +107,110 @@ Pass Rate: {pass_rate:.1f}%
 <tbody>
 '''
 
-        for testcase in testsuite.findall('testcase'):
-            test_name = testcase.get('name', '')
-            time_val = testcase.get('time', '0')
-            test_type = testcase.get('type', '')
-            result = testcase.get('result', 'PASS')
-            description = testcase.get('description', '')
-
-            # GitHub-style icons
-            if result == 'PASS':
-                icon = '''<svg class="octicon" style="color:#1a7f37" xmlns="http://www.w3.org/2000/svg" width="16" height="16" viewBox="0 0 16 16">
-<path d="M13.78 4.22a.75.75 0 0 1 0 1.06l-7.25 7.25a.75.75 0 0 1-1.06 0L2.22 9.28a.751.751 0 0 1 .018-1.042.751.751 0 0 1 1.042-.018L6 10.94l6.72-6.72a.75.75 0 0 1 1.06 0Z"></path>
-</svg>'''
-                state_class = 'State--success'
-            elif result == 'FAIL':
-                icon = '''<svg class="octicon" style="color:#cf222e" xmlns="http://www.w3.org/2000/svg" width="16" height="16" viewBox="0 0 16 16">
-<path d="M3.72 3.72a.75.75 0 0 1 1.06 0L8 6.94l3.22-3.22a.749.749 0 0 1 1.275.326.749.749 0 0 1-.215.734L9.06 8l3.22 3.22a.749.749 0 0 1-.326 1.275.749.749 0 0 1-.734-.215L8 9.06l-3.22 3.22a.751.751 0 0 1-1.042-.018.751.751 0 0 1-.018-1.042L6.94 8 3.72 4.78a.75.75 0 0 1 0-1.06Z"></path>
-</svg>'''
-                state_class = 'State--failure'
-            else:
-                icon = '''<svg class="octicon" style="color:#9a6700" xmlns="http://www.w3.org/2000/svg" width="16" height="16" viewBox="0 0 16 16">
-<path d="M6.457 1.047c.659-1.234 2.427-1.234 3.086 0l6.082 11.378A1.75 1.75 0 0 1 14.082 15H1.918a1.75 1.75 0 0 1-1.543-2.575Zm1.763.707a.25.25 0 0 0-.44 0L1.698 13.132a.25.25 0 0 0 .22.368h12.164a.25.25 0 0 0 .22-.368Zm.53 3.996v2.5a.75.75 0 0 1-1.5 0v-2.5a.75.75 0 0 1 1.5 0ZM9 11a1 1 0 1 1-2 0 1 1 0 0 1 2 0Z"></path>
-</svg>'''
-                state_class = 'State--error'
-
-            html += f'''
+ROW_TEMPLATE = '''
 <tr>
-<td><span class="test-name">{test_name}</span></td>
+<td><span class="test-name">{name}</span></td>
 <td>
 {icon}
 <span class="State {state_class}">{result}</span>
 </td>
-<td>{test_type}</td>
-<td><span class="time-value">{time_val}s</span></td>
-<td>{description if description else '-'}</td>
+<td>{type}</td>
+<td><span class="time-value">{time}s</span></td>
+<td>{description}</td>
 </tr>
 '''
 
-        html += '''
+def _write_header(out, root):
+    """Write the document head and summary counters from the root totals."""
+    attrib = root.attrib
+    total = int(attrib.get('tests', 0))
+    failures = int(attrib.get('failures', 0))
+    errors = int(attrib.get('errors', 0))
+    passed = total - failures - errors
+    pass_rate = (passed / total * 100) if total > 0 else 0
+
+    out.write(HEADER_TEMPLATE.format(
+        css=CSS,
+        total=total,
+        passed=passed,
+        failures=failures,
+        errors=errors,
+        pass_rate=pass_rate))
+
+def _write_suite_start(out, testsuite):
+    """Open a testsuite box and its results table."""
+    attrib = testsuite.attrib
+    out.write(SUITE_START_TEMPLATE.format(
+        name=escape(attrib.get('name', ''), quote=False),
+        tests=attrib.get('tests', 0)))
+
+def _write_testcase(out, testcase):
+    """Write one testcase row."""
+    attrib = testcase.attrib
+    result = attrib.get('result', 'PASS')
+
+    icon, state_class = _RESULT_STYLES.get(result, _ERROR_STYLE)
+
+    out.write(ROW_TEMPLATE.format(
+        name=escape(attrib.get('name', ''), quote=False),
+        icon=icon,
+        state_class=state_class,
+        result=escape(result, quote=False),
+        type=escape(attrib.get('type', ''), quote=False),
+        time=escape(attrib.get('time', '0'), quote=False),
+        description=escape(attrib.get('description', ''), quote=False) or '-'))
+
+def _write_suite_end(out):
+    """Close the results table and testsuite box."""
+    out.write('''
 </tbody>
 </table>
 </div>
 </div>
-'''
+''')
 
-    html += '</div>\n</body>\n</html>\n'
+def stream_xml_to_html(xml_path, out):
+    """Render the JUnit XML to HTML in a single iterparse pass.
+
+    Summary totals and suite headers come from start-event attributes, so each
+    row is written as soon as its testcase closes and no intermediate model is
+    built. Consumed elements are cleared to keep memory flat.
+    """
+    root = None
+    in_suite = False
+
+    for event, elem in ET.iterparse(xml_path, events=('start', 'end'), **_ITERPARSE_OPTIONS):
+        tag = elem.tag
+        if event == 'start':
+            if root is None:
+                root = elem
+                _write_header(out, root)
+            elif tag == 'testsuite':
+                in_suite = True
+                _write_suite_start(out, elem)
+        elif tag == 'testcase':
+            if in_suite:
+                _write_testcase(out, elem)
+            elem.clear()
+        elif tag == 'testsuite' and elem is not root:
+            in_suite = False
+            _write_suite_end(out)
+            elem.clear()
+
+    out.write('</div>\n</body>\n</html>\n')
+
+def xml_to_html(xml_path, html_path):
+    # 1 MiB buffer amortizes write syscalls across the per-row fragments
+    with open(html_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        stream_xml_to_html(xml_path, f)
 
-    with open(html_path, 'w', encoding='utf-8') as f:
-        f.write(html)
+    # Compressed copy for artifact upload; streamed so the report is never fully in memory
+    gz_path = html_path + '.gz'
+    with open(html_path, 'rb') as src, gzip.open(gz_path, 'wb', compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
 
     print(f"HTML report generated: {html_path}")
+    print(f"Compressed HTML report generated: {gz_path}")
 
 if __name__ == '__main__':
     xml_path = 'w3c_test_results.xml' if len(sys.argv) < 2 else sys.argv[1]
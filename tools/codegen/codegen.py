@@ -106,7 +106,7 @@ class CodeGenerator:
                     self._analyze_action(action, model)
 
             # Check entry/exit actions
-            for action in state.on_entry + state.on_exit:
+            for action in (*state.on_entry, *state.on_exit):
                 self._analyze_action(action, model)
 
         # Detect event metadata needs
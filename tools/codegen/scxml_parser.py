@@ -6,23 +6,143 @@ Parses W3C SCXML files and extracts state machine model for code generation.
 Replaces C++ SCXMLParser for Python-based code generation.
 """
 
+import hashlib
+import itertools
+import os
+import pickle
+import re
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from lxml import etree
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Set
+from typing import List, Dict, Optional, Sequence, Set
 from pathlib import Path
 
 # W3C SCXML namespace
 SCXML_NS = {'sc': 'http://www.w3.org/2005/07/scxml'}
+
+# Opt-in on-disk model cache: a directory, or "1" for ~/.cache/scxml_codegen
+_MODEL_CACHE_ENV = 'SCXML_MODEL_CACHE'
+
+# Event descriptors matching everything; never added to the event enum
+_WILDCARDS = frozenset(('*', '.*', '_*'))
+
+# W3C SCXML B.2: ECMAScript-only constructs and string literals need JSEngine
+# evaluation; one alternation scan instead of a substring test per feature
+_JS_EXPR_RE = re.compile(r"""typeof|_event\.|function|var |let |const |['"]""")
+
+# W3C SCXML 5.9.2: Only In('...') calls joined by &&, ||, parentheses and whitespace;
+# In(var), In("state") and In(`state`) are rejected
+_PURE_IN_PREDICATE_RE = re.compile(r"^[\s()&|]*(?:In\('[^']+'\)[\s()&|]*)+$")
+_IN_PREDICATE_RE = re.compile(r"In\('([^']+)'\)")
+# ECMAScript keywords rejected anywhere in a pure In() predicate, state ids included
+_IN_PREDICATE_ECMA_RE = re.compile('typeof|_event|function|var|let|const|return')
+
+# W3C SCXML 5.9: C++ reserved words that cannot lead a directly embedded expression
+_CPP_RESERVED = frozenset((
+    'return', 'break', 'continue', 'goto', 'switch', 'case', 'default',
+    'if', 'else', 'while', 'do', 'for', 'class', 'struct', 'typedef',
+    'using', 'namespace', 'template', 'typename', 'static', 'extern',
+    'inline', 'virtual', 'operator', 'new', 'delete', 'this', 'throw',
+    'try', 'catch', 'public', 'private', 'protected',
+))
+# Leading identifier characters ([A-Za-z0-9_] and other str.isalnum() chars)
+_LEADING_IDENT_RE = re.compile(r'\w*')
+
+# W3C SCXML 6.2: <send> attribute -> action key, in action key order
+_SEND_ATTR_KEYS = {
+    'event': 'event',
+    'eventexpr': 'eventexpr',
+    'target': 'target',
+    'targetexpr': 'targetexpr',
+    'type': 'send_type',  # Renamed from 'type' to avoid conflict with the action type
+    'delay': 'delay',
+    'delayexpr': 'delayexpr',
+    'id': 'id',
+    'idlocation': 'idlocation',
+    'namelist': 'namelist',  # W3C SCXML C.1: namelist for event data
+}
+_SEND_DEFAULTS = dict.fromkeys(_SEND_ATTR_KEYS.values(), '')
+
+# Clark-notation tags dispatched on by the streaming document pass
+_SC_NS = '{http://www.w3.org/2005/07/scxml}'
+_SC_DATAMODEL = _SC_NS + 'datamodel'
+_SC_SCRIPT = _SC_NS + 'script'
+_SC_CONTENT = _SC_NS + 'content'
+_SC_SCXML = _SC_NS + 'scxml'
+_SC_PARAM = _SC_NS + 'param'
+_SC_FINALIZE = _SC_NS + 'finalize'
+
+_STATE_KINDS = {
+    _SC_NS + 'state': 'state',
+    _SC_NS + 'parallel': 'parallel',
+    _SC_NS + 'final': 'final',
+    _SC_NS + 'history': 'history',
+}
+
+# Only these elements reach the streaming pass; lxml skips every other event in C.
+# The un-namespaced 'scxml' keeps a root missing its xmlns visible as the root.
+_STREAM_TAGS = ('scxml', _SC_SCXML, *_STATE_KINDS, _SC_DATAMODEL, _SC_SCRIPT)
+
+# Clark-notation names for ns_find/ns_findall, matched by lxml's C-level child iterator
+_CHILD_TAGS = {
+    tag: _SC_NS + tag
+    for tag in ('state', 'parallel', 'final', 'history', 'transition', 'onentry', 'onexit',
+                'initial', 'datamodel', 'data', 'invoke', 'param', 'content', 'finalize',
+                'donedata', 'script', 'scxml')
+}
+
+# W3C SCXML 5.2: any <datamodel>/<data> declaration makes a document need JSEngine,
+# so finding one settles a child's needs_jsengine without parsing it
+_DATA_DECLARATION_XPATH = etree.XPath(
+    'boolean(.//sc:datamodel/sc:data)', namespaces={'sc': _SC_NS[1:-1]})
+
+
+def _file_declares_data(path) -> bool:
+    """Stream a document up to its first <datamodel>/<data> declaration"""
+    for _, data in etree.iterparse(str(path), events=('start',), tag=_SC_NS + 'data'):
+        parent = data.getparent()
+        if parent is not None and parent.tag == _SC_DATAMODEL:
+            return True
+    return False
+
+
+def _localname(tag: str) -> str:
+    """Strip the namespace from a Clark-notation tag without building a QName"""
+    return tag[tag.rfind('}') + 1:] if tag[0] == '{' else tag
+
+
+def _unescape_logical_ops(expr: str) -> str:
+    """Undo doubly escaped && and || (W3C SCXML B.1); most guards have no '&amp;' to scan"""
+    if '&amp;' not in expr:
+        return expr
+    return expr.replace('&amp;&amp;', '&&').replace('&amp;|', '||')
+
+
+def _text(elem) -> str:
+    """Element text with surrounding whitespace removed, '' when there is none"""
+    text = elem.text
+    return text.strip() if text else ''
+
+
 def ns_find(elem, tag):
     """Find element with namespace"""
-    return elem.find(f'sc:{tag}', SCXML_NS)
+    return next(elem.iterchildren(_CHILD_TAGS[tag]), None)
 
 def ns_findall(elem, tag):
     """Find all elements with namespace"""
-    return elem.findall(f'sc:{tag}', SCXML_NS)
+    return list(elem.iterchildren(_CHILD_TAGS[tag]))
 
+def ns_children(elem):
+    """Group an element's SCXML children by local name in one pass over them"""
+    groups = {}
+    for child in elem.iterchildren(_SC_NS + '*'):
+        groups.setdefault(_localname(child.tag), []).append(child)
+    return groups
 
-@dataclass
+
+@dataclass(slots=True)
 class Transition:
     """W3C SCXML 3.3: Transition element"""
     event: str = ""
@@ -32,25 +152,33 @@ class Transition:
     is_pure_in_predicate: bool = False  # True if cond is ONLY In() predicates
     type: str = "external"  # external or internal
     actions: List[Dict] = field(default_factory=list)  # executable content
+    # Bound after parsing; left unset otherwise so templates can test `is defined`
+    history_target: str = field(init=False, repr=False, compare=False)  # W3C SCXML 3.11
+    prefix_matching_events: List[str] = field(init=False, repr=False, compare=False)  # set by codegen
 
 
-@dataclass
+@dataclass(slots=True)
 class State:
-    """W3C SCXML 3.3: State element"""
+    """
+    W3C SCXML 3.3: State element
+
+    Child collections default to a shared empty tuple; the parser assigns a list
+    only when the element actually has such children.
+    """
     id: str
     initial: str = ""
     is_final: bool = False
     is_parallel: bool = False
     parent: Optional[str] = None
-    transitions: List[Transition] = field(default_factory=list)
-    on_entry: List[Dict] = field(default_factory=list)
-    on_exit: List[Dict] = field(default_factory=list)
-    datamodel: List[Dict] = field(default_factory=list)
-    invokes: List[Dict] = field(default_factory=list)
-    static_invokes: List[Dict] = field(default_factory=list)  # Static invoke info for member generation
+    transitions: Sequence[Transition] = ()
+    on_entry: Sequence[Dict] = ()
+    on_exit: Sequence[Dict] = ()
+    datamodel: Sequence[Dict] = ()
+    invokes: Sequence[Dict] = ()
+    static_invokes: Sequence[Dict] = ()  # Static invoke info for member generation
     donedata: Optional[Dict] = None  # W3C SCXML 5.5: Donedata for final states
     document_order: int = 0  # W3C SCXML 3.13: Document order for exit order tie-breaking
-    initial_transition_actions: List[Dict] = field(default_factory=list)  # W3C SCXML 3.3.2: <initial> transition executable content
+    initial_transition_actions: Sequence[Dict] = ()  # W3C SCXML 3.3.2: <initial> transition executable content
 
 
 @dataclass
@@ -100,6 +228,19 @@ class SCXMLModel:
     # W3C SCXML 3.4: Parallel state regions (parallel_id -> [child_region_ids])
     parallel_regions: Dict[str, List[str]] = field(default_factory=dict)
 
+    # Direct child state IDs per parent ID (None for top-level), in model order
+    state_children: Dict[Optional[str], List[str]] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class _StateNode:
+    """State-like element collected by the streaming pass, registered into the model afterwards"""
+    kind: str  # state, parallel, final or history
+    parent_id: Optional[str] = None
+    state: Optional[State] = None
+    history: Optional[tuple] = None  # (history_id, info) for history nodes with a default target
+    children: List['_StateNode'] = field(default_factory=list)
+
 
 class SCXMLParser:
     """
@@ -120,10 +261,16 @@ class SCXMLParser:
         '_event.invokeid',
         '_event.type'
     ]
+    # Any of the fields above as a substring, in one scan
+    _EVENT_METADATA_RE = re.compile('|'.join(map(re.escape, EVENT_METADATA_FIELDS)))
+
+    # (resolved child path, mtime_ns, size) -> child needs_jsengine, shared by all parsers
+    _child_jsengine_cache: Dict[tuple, bool] = {}
 
     def __init__(self):
         self.model = None
-        self.document_order_counter = 0  # W3C SCXML 3.13: Track document order
+        self.document_order_counter = itertools.count()  # W3C SCXML 3.13: Track document order
+        self._state_datamodels = {}  # parent element -> <data> declarations seen by the streaming pass
 
     def parse_file(self, scxml_path: str) -> SCXMLModel:
         """
@@ -137,48 +284,20 @@ class SCXMLParser:
         """
         # Store scxml_path for child resolution in _process_static_invokes
         self.scxml_path = scxml_path
+        self._leaf_cache = {}  # state_id -> leaf state ID (_resolve_to_leaf_state)
+        self._transitions_by_target = {}  # target attribute -> transitions (_resolve_history_targets)
 
-        tree = etree.parse(scxml_path)
-        root = tree.getroot()
-
-        # Note: Using lxml with QName().localname, no need to strip namespaces
-
-        # Use filename for model name to ensure uniqueness
-        # W3C SCXML 6.4: Multiple tests may use same SCXML name attribute (e.g., test338 and test347 both use "machineName")
-        # Using filename (not name attribute) ensures unique namespaces (test338_machineName vs test347_machineName)
-        name = Path(scxml_path).stem
+        cache_file = self._model_cache_file(scxml_path)
+        if cache_file is not None:
+            try:
+                with open(cache_file, 'rb') as f:
+                    self.model = pickle.load(f)
+                return self.model
+            except Exception:
+                pass  # Missing or unreadable entry - parse normally
 
-        # Get initial attribute (W3C SCXML 3.6)
-        initial = root.get('initial', '')
-
-        # W3C SCXML 3.6: If no initial attribute, default to first child state in document order
-        if not initial:
-            # Find first child state element
-            first_state = ns_find(root, 'state')
-            if first_state is None:
-                first_state = ns_find(root, 'parallel')
-            if first_state is None:
-                first_state = ns_find(root, 'final')
-
-            if first_state is not None:
-                initial = first_state.get('id', '')
-
-        # Create model
-        self.model = SCXMLModel(
-            name=name,
-            initial=initial,
-            binding=root.get('binding', 'early'),
-            datamodel_type=root.get('datamodel', 'ecmascript')
-        )
-
-        # Parse datamodel
-        self._parse_datamodel(root)
-
-        # W3C SCXML 5.8: Parse global (top-level) scripts
-        self._parse_global_scripts(root)
-
-        # Parse states recursively
-        self._parse_states(root, None)
+        # Single streaming pass: builds the model and releases parsed subtrees
+        self._parse_document(scxml_path)
 
         # Detect features
         self._detect_features()
@@ -186,13 +305,17 @@ class SCXMLParser:
         # Process static invoke info - extract child names from src paths
         self._process_static_invokes()
 
+        # W3C SCXML 3.13: initial may hold space-separated state IDs; split it once
+        # for both passes (the first only rewrites a single-token initial)
+        initial_states = self.model.initial.split()
+
         # Resolve deep initial state (matches C++ generator behavior)
         # W3C SCXML 3.6: Follow initial attributes recursively to find leaf state
-        self._resolve_deep_initial()
+        self._resolve_deep_initial(initial_states)
         
         # W3C SCXML 3.13: Apply parallel initial state overrides
         # If scxml initial contains space-separated states, override each region's initial
-        self._apply_parallel_initial_overrides()
+        self._apply_parallel_initial_overrides(initial_states)
 
         # Resolve history state transitions (W3C SCXML 3.11)
         # Replace history state targets with their default transition targets
@@ -201,70 +324,150 @@ class SCXMLParser:
         # W3C SCXML 3.4: Compute parallel regions (child states of parallel states)
         self._compute_parallel_regions()
 
-        # W3C SCXML 3.13: Check if any transitions have actions (for static optimization)
-        self._detect_transition_actions()
-
         # W3C SCXML 3.7: Add done.state events for states with final children
         self._add_done_state_events()
 
+        if cache_file is not None and self._is_model_cacheable():
+            self._store_model_cache(cache_file)
+
         return self.model
 
-    def _parse_datamodel(self, root):
-        """Parse <datamodel> elements (W3C SCXML 5.2)"""
-        for datamodel in root.findall('.//sc:datamodel', SCXML_NS):
-            for data in ns_findall(datamodel, 'data'):
-                var_id = data.get('id')
-                expr = data.get('expr', '')
-                src = data.get('src', '')
-
-                # Get text content
-                content = data.text or ''
-
-                # W3C SCXML 5.2.2: Load external content from src attribute
-                # ARCHITECTURE.MD: Zero Duplication - Same logic as FileLoadingHelper (Single Source of Truth)
-                if src:
-                    # FileLoadingHelper::normalizePath() equivalent
-                    # Remove "file://" or "file:" prefix
-                    file_path = src
-                    if file_path.startswith('file://'):
-                        file_path = file_path[7:]  # Remove "file://"
-                    elif file_path.startswith('file:'):
-                        file_path = file_path[5:]  # Remove "file:"
-
-                    # Resolve relative to SCXML file directory
-                    scxml_dir = Path(self.scxml_path).parent
-                    full_path = scxml_dir / file_path
-
-                    try:
-                        # FileLoadingHelper::loadFileContent() equivalent
-                        with open(full_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-
-                        # W3C SCXML 5.2.2: Trim whitespace for consistency
-                        content = content.strip()
-                    except FileNotFoundError:
-                        import logging
-                        logging.warning(f"External data file not found: {full_path}")
-                        content = ''
-                    except Exception as e:
-                        import logging
-                        logging.warning(f"Failed to read external data file {full_path}: {e}")
-                        content = ''
-
-                self.model.variables.append({
-                    'id': var_id,
-                    'expr': expr,
-                    'src': src,
-                    'content': content.strip()
-                })
+    @staticmethod
+    def _model_cache_file(scxml_path: str) -> Optional[Path]:
+        """
+        Cache entry for a file, or None when SCXML_MODEL_CACHE is unset
 
-                # Detect if expression requires JSEngine
-                # W3C SCXML 5.2: All datamodel variables are runtime-evaluated (handled by JSEngine)
-                self.model.needs_jsengine = True
+        The key covers the file's path, mtime and size plus this module's own
+        mtime, so editing either the document or the parser invalidates it.
+        """
+        cache_dir = os.environ.get(_MODEL_CACHE_ENV)
+        if not cache_dir:
+            return None
+        if cache_dir == '1':
+            cache_dir = Path.home() / '.cache' / 'scxml_codegen'
+
+        try:
+            stat = os.stat(scxml_path)
+            parser_mtime = os.stat(__file__).st_mtime_ns
+        except OSError:
+            return None
+
+        key = f"{os.path.abspath(scxml_path)}\0{stat.st_mtime_ns}\0{stat.st_size}\0{parser_mtime}"
+        digest = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        return Path(cache_dir) / f"{digest}.pkl"
+
+    def _is_model_cacheable(self) -> bool:
+        """
+        Only self-contained models are cached
+
+        Invokes read child documents and extract inline ones to disk, while
+        <data src> and top-level <script src> copy external file contents into
+        the model; none of that is covered by the key.
+        """
+        if self.model.has_invoke:
+            return False
+        if any(script['src'] for script in self.model.global_scripts):
+            return False
+        return not any(var['src'] for var in self.model.variables)
+
+    def _store_model_cache(self, cache_file: Path):
+        """Write the model atomically; caching failures never fail the parse"""
+        tmp_file = cache_file.with_suffix(f'.{os.getpid()}.tmp')
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_file, 'wb') as f:
+                pickle.dump(self.model, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            try:
+                tmp_file.unlink()
+            except OSError:
+                pass
+
+    @classmethod
+    def parse_files(cls, scxml_paths: List[str], workers: Optional[int] = None) -> List[SCXMLModel]:
+        """
+        Parse several SCXML files in parallel worker processes
+
+        Parsing is CPU-bound and holds the GIL, so files are spread over a
+        process pool. Inline <content><scxml> elements are dropped from the
+        returned invokes: parse_file() has already extracted them to files and
+        lxml elements cannot cross process boundaries.
+
+        Args:
+            scxml_paths: Paths to SCXML files
+            workers: Number of worker processes (default: CPU count)
+
+        Returns:
+            SCXMLModels in the order of scxml_paths
+        """
+        workers = workers or os.cpu_count() or 1
+        chunksize = max(1, len(scxml_paths) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_parse_one, scxml_paths, chunksize=chunksize))
+
+    def _parse_datamodel(self, datamodel):
+        """
+        Parse a <datamodel> element (W3C SCXML 5.2)
+
+        Each <data> is visited once: it becomes a model variable and is recorded
+        against the enclosing element for _parse_state() to pick up.
+        """
+        declarations = self._state_datamodels.setdefault(datamodel.getparent(), [])
+        for data in ns_findall(datamodel, 'data'):
+            var_id = data.get('id')
+            expr = data.get('expr', '')
+            src = data.get('src', '')
+            declarations.append({'id': var_id, 'expr': expr, 'src': src})
+
+            # Get text content (stripped; external content below is stripped too)
+            content = _text(data)
+
+            # W3C SCXML 5.2.2: Load external content from src attribute
+            # ARCHITECTURE.MD: Zero Duplication - Same logic as FileLoadingHelper (Single Source of Truth)
+            if src:
+                # FileLoadingHelper::normalizePath() equivalent
+                # Remove "file://" or "file:" prefix
+                file_path = src
+                if file_path.startswith('file://'):
+                    file_path = file_path[7:]  # Remove "file://"
+                elif file_path.startswith('file:'):
+                    file_path = file_path[5:]  # Remove "file:"
+
+                # Resolve relative to SCXML file directory
+                scxml_dir = Path(self.scxml_path).parent
+                full_path = scxml_dir / file_path
+
+                try:
+                    # FileLoadingHelper::loadFileContent() equivalent
+                    with open(full_path, 'r', encoding='utf-8') as f:
+                        content = f.read()
+
+                    # W3C SCXML 5.2.2: Trim whitespace for consistency
+                    content = content.strip()
+                except FileNotFoundError:
+                    import logging
+                    logging.warning(f"External data file not found: {full_path}")
+                    content = ''
+                except Exception as e:
+                    import logging
+                    logging.warning(f"Failed to read external data file {full_path}: {e}")
+                    content = ''
+
+            self.model.variables.append({
+                'id': var_id,
+                'expr': expr,
+                'src': src,
+                'content': content
+            })
 
-    def _parse_global_scripts(self, root):
+            # Detect if expression requires JSEngine
+            # W3C SCXML 5.2: All datamodel variables are runtime-evaluated (handled by JSEngine)
+            self.model.needs_jsengine = True
+
+    def _parse_global_script(self, script_elem):
         """
-        Parse top-level &lt;script&gt; elements (W3C SCXML 5.8)
+        Parse a top-level &lt;script&gt; element (W3C SCXML 5.8)
 
         Global scripts are children of &lt;scxml&gt; root and are executed
         at document load time, after datamodel initialization but before
@@ -280,281 +483,446 @@ class SCXMLParser:
         """
         import logging
 
-        # Find direct children &lt;script&gt; elements of &lt;scxml&gt; root
-        for script_elem in root.findall('./sc:script', SCXML_NS):
-            src = script_elem.get('src', '')
-            content = script_elem.text or ''
-
-            # W3C SCXML 5.8: External script loading (src attribute)
-            if src:
+        src = script_elem.get('src', '')
+        content = script_elem.text or ''
+
+        # W3C SCXML 5.8: External script loading (src attribute)
+        if src:
+            try:
+                # ARCHITECTURE.md Zero Duplication: FileLoadingHelper::loadExternalScript() equivalent
+                # Step 1: Normalize path (remove "file:" prefix) - FileLoadingHelper::normalizePath()
+                normalized_src = src
+                if normalized_src.startswith('file://'):
+                    normalized_src = normalized_src[7:]  # Remove "file://"
+                elif normalized_src.startswith('file:'):
+                    normalized_src = normalized_src[5:]  # Remove "file:"
+
+                # Step 2: Resolve path relative to SCXML file location
+                scxml_dir = Path(self.scxml_path).parent
+                script_path = scxml_dir / normalized_src
+                script_path = script_path.resolve()
+
+                # Step 3: Security validation - prevent path traversal attacks
+                # FileLoadingHelper::loadExternalScript() security check equivalent
+                scxml_dir_resolved = scxml_dir.resolve()
+
+                # Check if script_path is within allowed directory tree
+                # Use relative_to() to verify path is inside scxml_dir
                 try:
-                    # ARCHITECTURE.md Zero Duplication: FileLoadingHelper::loadExternalScript() equivalent
-                    # Step 1: Normalize path (remove "file:" prefix) - FileLoadingHelper::normalizePath()
-                    normalized_src = src
-                    if normalized_src.startswith('file://'):
-                        normalized_src = normalized_src[7:]  # Remove "file://"
-                    elif normalized_src.startswith('file:'):
-                        normalized_src = normalized_src[5:]  # Remove "file:"
-
-                    # Step 2: Resolve path relative to SCXML file location
-                    scxml_dir = Path(self.scxml_path).parent
-                    script_path = scxml_dir / normalized_src
-                    script_path = script_path.resolve()
-
-                    # Step 3: Security validation - prevent path traversal attacks
-                    # FileLoadingHelper::loadExternalScript() security check equivalent
-                    scxml_dir_resolved = scxml_dir.resolve()
-
-                    # Check if script_path is within allowed directory tree
-                    # Use relative_to() to verify path is inside scxml_dir
-                    try:
-                        relative_path = script_path.relative_to(scxml_dir_resolved)
-                        # If relative_to() succeeds, check for ".." in path
-                        if '..' in str(relative_path):
-                            raise ValueError("Path contains '..' after resolution")
-                    except ValueError:
-                        # script_path is not relative to scxml_dir (path traversal attempt)
-                        raise ValueError(
-                            f"Security violation: Script path '{src}' resolves outside SCXML directory. "
-                            f"Resolved to: {script_path}, SCXML dir: {scxml_dir_resolved}"
-                        )
-
-                    # Step 4: Load file content - FileLoadingHelper::loadFileContent() equivalent
-                    logging.info(f"FileLoadingHelper pattern: W3C SCXML 5.8 - Loading external script: {src} (resolved to {script_path})")
-                    content = script_path.read_text(encoding='utf-8')
-
-                    # W3C SCXML 5.8: Content loaded successfully
-
-                except FileNotFoundError:
-                    # W3C SCXML 5.8: Document MUST be rejected if script cannot be loaded
-                    # FileLoadingHelper::loadExternalScript() error message equivalent
-                    raise ValueError(
-                        f"W3C SCXML 5.8: External script file not found: '{src}' "
-                        f"(resolved to {script_path}). Document is non-conformant and MUST be rejected."
-                    )
-                except PermissionError as e:
-                    # W3C SCXML 5.8: Document MUST be rejected if script cannot be loaded
-                    raise ValueError(
-                        f"W3C SCXML 5.8: Cannot read external script file: '{src}' "
-                        f"(resolved to {script_path}). Permission denied: {e}"
-                    )
-                except ValueError as e:
-                    # Security violation or other value error - propagate
-                    raise
-                except Exception as e:
-                    # Any other error loading script
+                    relative_path = script_path.relative_to(scxml_dir_resolved)
+                    # If relative_to() succeeds, check for ".." in path
+                    if '..' in str(relative_path):
+                        raise ValueError("Path contains '..' after resolution")
+                except ValueError:
+                    # script_path is not relative to scxml_dir (path traversal attempt)
                     raise ValueError(
-                        f"W3C SCXML 5.8: Failed to load external script: '{src}'. Error: {e}"
+                        f"Security violation: Script path '{src}' resolves outside SCXML directory. "
+                        f"Resolved to: {script_path}, SCXML dir: {scxml_dir_resolved}"
                     )
 
-            self.model.global_scripts.append({
-                'type': 'script',
-                'src': src,
-                'content': content.strip()
-            })
-
-            # W3C SCXML 5.8: Global scripts require JSEngine
-            self.model.needs_jsengine = True
-
-    def _parse_states(self, parent_elem, parent_id: Optional[str]):
+                # Step 4: Load file content - FileLoadingHelper::loadFileContent() equivalent
+                logging.info(f"FileLoadingHelper pattern: W3C SCXML 5.8 - Loading external script: {src} (resolved to {script_path})")
+                content = script_path.read_text(encoding='utf-8')
+
+                # W3C SCXML 5.8: Content loaded successfully
+
+            except FileNotFoundError:
+                # W3C SCXML 5.8: Document MUST be rejected if script cannot be loaded
+                # FileLoadingHelper::loadExternalScript() error message equivalent
+                raise ValueError(
+                    f"W3C SCXML 5.8: External script file not found: '{src}' "
+                    f"(resolved to {script_path}). Document is non-conformant and MUST be rejected."
+                )
+            except PermissionError as e:
+                # W3C SCXML 5.8: Document MUST be rejected if script cannot be loaded
+                raise ValueError(
+                    f"W3C SCXML 5.8: Cannot read external script file: '{src}' "
+                    f"(resolved to {script_path}). Permission denied: {e}"
+                )
+            except ValueError as e:
+                # Security violation or other value error - propagate
+                raise
+            except Exception as e:
+                # Any other error loading script
+                raise ValueError(
+                    f"W3C SCXML 5.8: Failed to load external script: '{src}'. Error: {e}"
+                )
+
+        self.model.global_scripts.append({
+            'type': 'script',
+            'src': src,
+            'content': content.strip()
+        })
+
+        # W3C SCXML 5.8: Global scripts require JSEngine
+        self.model.needs_jsengine = True
+
+    def _parse_document(self, scxml_path: str):
         """
-        Recursively parse states (W3C SCXML 3.3)
+        Build the model in a single streaming pass over the document (W3C SCXML 3.3)
+
+        Each <state>/<parallel>/<final>/<history> is materialized on its end event,
+        when its subtree is complete. It is then cleared and detached on the next
+        end event, so only the still-open branch of the DOM is held.
+        Once an invoke references inline <content><scxml>, the rest of the tree is
+        kept intact for its later serialization. States are registered afterwards by
+        _register_states() to keep the model order of the original recursive walk.
 
         Args:
-            parent_elem: Parent XML element
-            parent_id: Parent state ID (None for root)
+            scxml_path: Path to SCXML file
         """
-        # Parse <state> elements
-        for state_elem in ns_findall(parent_elem, 'state'):
-            state_id = state_elem.get('id')
-            if not state_id:
+        root = None
+        root_nodes = []
+        containers = []  # (element, node) for <state>/<parallel> whose children are being read
+        leaf = None  # (element, node) for the <final>/<history> being read
+        first_child_ids = {}  # W3C SCXML 3.6: id of first root <state>/<parallel>/<final>
+        retain_tree = False
+        processed = None  # Last cleared element, detached once parsing has moved past it
+
+        for event, elem in etree.iterparse(scxml_path, events=('start', 'end'), tag=_STREAM_TAGS):
+            tag = elem.tag
+
+            if event == 'start':
+                if root is None:
+                    root = elem
+                    # Use filename for model name to ensure uniqueness
+                    # W3C SCXML 6.4: Multiple tests may use same SCXML name attribute (e.g., test338 and test347 both use "machineName")
+                    # Using filename (not name attribute) ensures unique namespaces (test338_machineName vs test347_machineName)
+                    self.model = SCXMLModel(
+                        name=Path(scxml_path).stem,
+                        initial=root.get('initial', ''),  # W3C SCXML 3.6
+                        binding=root.get('binding', 'early'),
+                        datamodel_type=root.get('datamodel', 'ecmascript')
+                    )
+                    continue
+
+                kind = _STATE_KINDS.get(tag)
+                if kind is None:
+                    continue
+
+                parent = elem.getparent()
+                if parent is root and kind != 'history':
+                    first_child_ids.setdefault(kind, elem.get('id', ''))
+
+                # Only direct children of the root or of a parsed <state>/<parallel> are states
+                # of this machine (not inline <invoke> content or children of id-less states)
+                container, siblings = containers[-1] if containers else (root, None)
+                if parent is not container or not elem.get('id'):
+                    continue
+
+                node = _StateNode(kind=kind, parent_id=sys.intern(container.get('id')) if containers else None)
+                (siblings.children if siblings else root_nodes).append(node)
+                if kind in ('state', 'parallel'):
+                    containers.append((elem, node))
+                else:
+                    leaf = (elem, node)
                 continue
 
-            state = State(
-                id=state_id,
-                initial=state_elem.get('initial', ''),
-                parent=parent_id,
-                document_order=self.document_order_counter
-            )
-            self.document_order_counter += 1
-
-            # Parse transitions
-            for trans_elem in ns_findall(state_elem, 'transition'):
-                transition = self._parse_transition(trans_elem)
-                state.transitions.append(transition)
-
-                # Collect event names
-                if transition.event:
-                    # W3C SCXML 5.9.3: Add transition events to enum, but skip wildcard patterns
-                    # Wildcards (*) and patterns (foo.*) are handled by EventMatchingHelper at runtime
-                    if transition.event not in ['*', '.*', '_*']:
-                        # Handle multiple events (e.g., "event1 event2")
-                        for event in transition.event.split():
-                            # Skip wildcards and wildcard patterns
-                            if event not in ['*', '.*', '_*'] and not event.endswith('.*'):
-                                # Regular event - add to enum
-                                self.model.events.add(event)
-
-            # Parse onentry
-            for entry_elem in ns_findall(state_elem, 'onentry'):
-                state.on_entry.extend(self._parse_executable_content(entry_elem))
-
-            # Parse onexit
-            for exit_elem in ns_findall(state_elem, 'onexit'):
-                state.on_exit.extend(self._parse_executable_content(exit_elem))
-
-            # W3C SCXML 3.3.2: Parse <initial> transition executable content
-            # This content executes AFTER parent onentry and BEFORE child state entry
-            initial_elem = ns_find(state_elem, 'initial')
-            if initial_elem is not None:
-                # <initial> contains a <transition> element with executable content
-                initial_trans_elem = ns_find(initial_elem, 'transition')
-                if initial_trans_elem is not None:
-                    state.initial_transition_actions = self._parse_executable_content(initial_trans_elem)
-                    # W3C SCXML 3.3: Extract target from <initial> transition (if state.initial empty)
-                    # History state targets will be resolved later by _resolve_history_targets()
-                    if not state.initial:
-                        initial_target = initial_trans_elem.get('target', '')
-                        if initial_target:
-                            state.initial = initial_target
-
-            # Parse datamodel
-            for datamodel in ns_findall(state_elem, 'datamodel'):
-                for data in ns_findall(datamodel, 'data'):
-                    state.datamodel.append({
-                        'id': data.get('id'),
-                        'expr': data.get('expr', ''),
-                        'src': data.get('src', '')
-                    })
-
-            # Parse invoke
-            for invoke_elem in ns_findall(state_elem, 'invoke'):
-                invoke = self._parse_invoke(invoke_elem)
-                state.invokes.append(invoke)
-                self.model.has_invoke = True
-                
-                # Track dynamic vs static invoke
-                if not invoke.get('is_static', False):
-                    self.model.has_dynamic_invoke = True
+            if containers and elem is containers[-1][0]:
+                node = containers.pop()[1]
+                if node.kind == 'state':
+                    node.state = self._parse_state(elem, node.parent_id)
+                    # Detaching a subtree re-serializes its namespaces, so keep the DOM
+                    # intact once inline <content><scxml> is referenced by an invoke
+                    retain_tree = retain_tree or any(
+                        invoke.get('has_inline_scxml', False) for invoke in node.state.invokes)
+                else:
+                    node.state = self._parse_parallel(elem, node.parent_id)
+            elif leaf is not None and elem is leaf[0]:
+                node = leaf[1]
+                leaf = None
+                if node.kind == 'final':
+                    node.state = self._parse_final(elem, node.parent_id)
                 else:
-                    # Build static invoke info (matches C++ StaticInvokeInfo)
-                    static_invoke = {
-                        'invoke_id': invoke.get('id', ''),
-                        'child_name': '',  # Will be set after parsing child file name
-                        'state_name': state_id,
-                        'autoforward': invoke.get('autoforward', 'false') == 'true',
-                        'finalize_content': '',  # TODO: extract finalize script
-                        'src': invoke.get('src', ''),
-                        'params': invoke.get('params', []),
-                        'idlocation': invoke.get('idlocation', '')  # W3C SCXML 6.4.1
-                    }
-                    state.static_invokes.append(static_invoke)
-                    self.model.static_invokes.append(static_invoke)
-
-            self.model.states[state_id] = state
-
-            # Recursively parse child states
-            self._parse_states(state_elem, state_id)
-
-        # Parse <final> elements
-        for final_elem in ns_findall(parent_elem, 'final'):
-            final_id = final_elem.get('id')
-            if not final_id:
+                    node.history = self._parse_history(elem, node.parent_id)
+            elif tag == _SC_DATAMODEL:
+                self._parse_datamodel(elem)
                 continue
+            elif tag == _SC_SCRIPT and elem.getparent() is root:
+                # W3C SCXML 5.8: Global (top-level) script
+                self._parse_global_script(elem)
+            else:
+                continue
+
+            if not retain_tree:
+                elem.clear(keep_tail=True)
+                # Detach the previous shell rather than the element iterparse just
+                # closed; nothing reads a parsed element again, and one removal per
+                # end event keeps the pass linear in sibling count. A shell already
+                # dropped by its parent's clear() has no parent left.
+                if processed is not None:
+                    processed_parent = processed.getparent()
+                    if processed_parent is not None:
+                        processed_parent.remove(processed)
+                processed = elem
 
-            state = State(
-                id=final_id,
-                is_final=True,
-                parent=parent_id,
-                document_order=self.document_order_counter
-            )
-            self.document_order_counter += 1
+        # W3C SCXML 3.6: If no initial attribute, default to first child state in document order
+        if not self.model.initial:
+            for kind in ('state', 'parallel', 'final'):
+                if kind in first_child_ids:
+                    self.model.initial = first_child_ids[kind]
+                    break
 
-            # Parse onentry/onexit for final states
-            for entry_elem in ns_findall(final_elem, 'onentry'):
-                state.on_entry.extend(self._parse_executable_content(entry_elem))
+        self._state_datamodels.clear()
+        self._register_states(root_nodes)
 
-            for exit_elem in ns_findall(final_elem, 'onexit'):
-                state.on_exit.extend(self._parse_executable_content(exit_elem))
+        # Parent -> children index so later passes avoid rescanning all states per parent
+        state_children = self.model.state_children
+        for state_id, state in self.model.states.items():
+            state_children.setdefault(state.parent, []).append(state_id)
 
-            # Parse <donedata> for final states (W3C SCXML 5.5)
-            donedata_elem = ns_find(final_elem, 'donedata')
-            if donedata_elem is not None:
-                state.donedata = self._parse_donedata(donedata_elem)
+    def _register_states(self, nodes: List['_StateNode']):
+        """
+        Add streamed states to the model in document order (W3C SCXML 3.13)
 
-            self.model.states[final_id] = state
+        At each level <state> subtrees come first, then <final>, <parallel> and
+        <history> siblings, matching the original recursive walk. Levels are
+        walked depth-first with an explicit stack, so nesting depth is not
+        bounded by the recursion limit.
 
-        # Parse <parallel> elements
-        for parallel_elem in ns_findall(parent_elem, 'parallel'):
-            parallel_id = parallel_elem.get('id')
-            if not parallel_id:
+        Args:
+            nodes: Top-level nodes, in document order
+        """
+        def by_kind_order(level):
+            # Route each child once into its kind bucket instead of rescanning per kind
+            by_kind = {'state': [], 'final': [], 'parallel': [], 'history': []}
+            for node in level:
+                by_kind[node.kind].append(node)
+            return iter([node for kind_nodes in by_kind.values() for node in kind_nodes])
+
+        stack = [by_kind_order(nodes)]
+        while stack:
+            node = next(stack[-1], None)
+            if node is None:
+                stack.pop()
                 continue
 
-            state = State(
-                id=parallel_id,
-                is_parallel=True,
-                parent=parent_id,
-                document_order=self.document_order_counter
-            )
-            self.document_order_counter += 1
-
-            # W3C SCXML 3.4: Parallel states can have transitions and onexit/onentry
-            # Parse transitions
-            for trans_elem in ns_findall(parallel_elem, 'transition'):
-                transition = self._parse_transition(trans_elem)
-                state.transitions.append(transition)
-
-                # Collect event names
-                if transition.event:
-                    if transition.event not in ['*', '.*', '_*']:
-                        for event in transition.event.split():
-                            if event not in ['*', '.*', '_*'] and not event.endswith('.*'):
-                                self.model.events.add(event)
-
-            # Parse onentry
-            for entry_elem in ns_findall(parallel_elem, 'onentry'):
-                state.on_entry.extend(self._parse_executable_content(entry_elem))
-
-            # Parse onexit
-            for exit_elem in ns_findall(parallel_elem, 'onexit'):
-                state.on_exit.extend(self._parse_executable_content(exit_elem))
-
-            self.model.states[parallel_id] = state
-            self.model.has_parallel_states = True
-
-            # Recursively parse child states (parallel regions)
-            self._parse_states(parallel_elem, parallel_id)
-
-        # Parse <history> elements (W3C SCXML 3.11)
-        for history_elem in ns_findall(parent_elem, 'history'):
-            history_id = history_elem.get('id')
-            if not history_id:
+            if node.kind == 'history':
+                if node.history:
+                    history_id, history_info = node.history
+                    # Map history state ID to its default transition target
+                    self.model.history_default_targets[history_id] = history_info['default_target']
+                    self.model.history_states[history_id] = history_info
+                    self.model.has_history_states = True
                 continue
 
-            history_type = history_elem.get('type', 'shallow')  # W3C SCXML 3.11: shallow or deep
-
-            # W3C SCXML 3.11: History states have default transitions
-            # Extract the default target from the history's transition element
-            default_target = None
-            for trans_elem in ns_findall(history_elem, 'transition'):
-                target = trans_elem.get('target')
-                if target:
-                    default_target = target
-                    break  # Use first transition as default
-
-            if default_target:
-                # Map history state ID to its default transition target
-                self.model.history_default_targets[history_id] = default_target
-                
-                # Store comprehensive history state information  
-                # Leaf target will be resolved later in _resolve_history_targets()
-                self.model.history_states[history_id] = {
-                    'parent': parent_id,  # Parent compound state
-                    'type': history_type,  # shallow or deep
-                    'default_target': default_target  # Default transition target
+            state = node.state
+            state.document_order = next(self.document_order_counter)
+
+            self.model.static_invokes.extend(state.static_invokes)
+            self.model.states[state.id] = state
+
+            if node.kind == 'parallel':
+                self.model.has_parallel_states = True
+
+            # Register child states (parallel regions for <parallel>) before the next sibling
+            stack.append(by_kind_order(node.children))
+
+    def _parse_state(self, state_elem, parent_id: Optional[str]) -> State:
+        """Parse <state> element (W3C SCXML 3.3)"""
+        state_id = sys.intern(state_elem.get('id'))
+        state = State(
+            id=state_id,
+            initial=state_elem.get('initial', ''),
+            parent=parent_id
+        )
+        children = ns_children(state_elem)
+
+        # Parse transitions
+        transitions = self._parse_transitions(children.get('transition', ()))
+        if transitions:
+            state.transitions = transitions
+
+        # Parse onentry
+        on_entry = self._parse_handler_blocks(children.get('onentry', ()))
+        if on_entry:
+            state.on_entry = on_entry
+
+        # Parse onexit
+        on_exit = self._parse_handler_blocks(children.get('onexit', ()))
+        if on_exit:
+            state.on_exit = on_exit
+
+        # W3C SCXML 3.3.2: Parse <initial> transition executable content
+        # This content executes AFTER parent onentry and BEFORE child state entry
+        if 'initial' in children:
+            initial_elem = children['initial'][0]
+            # <initial> contains a <transition> element with executable content
+            initial_trans_elem = ns_find(initial_elem, 'transition')
+            if initial_trans_elem is not None:
+                state.initial_transition_actions = self._parse_executable_content(initial_trans_elem)
+                # W3C SCXML 3.3: Extract target from <initial> transition (if state.initial empty)
+                # History state targets will be resolved later by _resolve_history_targets()
+                if not state.initial:
+                    initial_target = initial_trans_elem.get('target', '')
+                    if initial_target:
+                        state.initial = initial_target
+
+        # Parse datamodel (already collected when its <datamodel> closed)
+        datamodel = self._state_datamodels.pop(state_elem, None)
+        if datamodel:
+            state.datamodel = datamodel
+
+        # Parse invoke
+        invoke_elems = children.get('invoke', ())
+        if invoke_elems:
+            state.invokes = []
+        for invoke_elem in invoke_elems:
+            invoke = self._parse_invoke(invoke_elem)
+            state.invokes.append(invoke)
+            self.model.has_invoke = True
+            
+            # Track dynamic vs static invoke
+            if not invoke.get('is_static', False):
+                self.model.has_dynamic_invoke = True
+            else:
+                # Build static invoke info (matches C++ StaticInvokeInfo)
+                static_invoke = {
+                    'invoke_id': invoke.get('id', ''),
+                    'child_name': '',  # Will be set after parsing child file name
+                    'state_name': state_id,
+                    'autoforward': invoke.get('autoforward', 'false') == 'true',
+                    'finalize_content': '',  # TODO: extract finalize script
+                    'src': invoke.get('src', ''),
+                    'params': invoke.get('params', []),
+                    'idlocation': invoke.get('idlocation', '')  # W3C SCXML 6.4.1
                 }
-                
-                self.model.has_history_states = True
+                if not state.static_invokes:
+                    state.static_invokes = []
+                state.static_invokes.append(static_invoke)
+
+        return state
+
+    def _parse_final(self, final_elem, parent_id: Optional[str]) -> State:
+        """Parse <final> element (W3C SCXML 3.7)"""
+        state = State(
+            id=sys.intern(final_elem.get('id')),
+            is_final=True,
+            parent=parent_id
+        )
+        children = ns_children(final_elem)
+
+        # Parse onentry/onexit for final states
+        on_entry = self._parse_handler_blocks(children.get('onentry', ()))
+        if on_entry:
+            state.on_entry = on_entry
+
+        on_exit = self._parse_handler_blocks(children.get('onexit', ()))
+        if on_exit:
+            state.on_exit = on_exit
+
+        # Parse <donedata> for final states (W3C SCXML 5.5)
+        if 'donedata' in children:
+            state.donedata = self._parse_donedata(children['donedata'][0])
+
+        return state
+
+    def _parse_parallel(self, parallel_elem, parent_id: Optional[str]) -> State:
+        """Parse <parallel> element (W3C SCXML 3.4)"""
+        state = State(
+            id=sys.intern(parallel_elem.get('id')),
+            is_parallel=True,
+            parent=parent_id
+        )
+        children = ns_children(parallel_elem)
+
+        # W3C SCXML 3.4: Parallel states can have transitions and onexit/onentry
+        # Parse transitions
+        transitions = self._parse_transitions(children.get('transition', ()))
+        if transitions:
+            state.transitions = transitions
+
+        # Parse onentry
+        on_entry = self._parse_handler_blocks(children.get('onentry', ()))
+        if on_entry:
+            state.on_entry = on_entry
+
+        # Parse onexit
+        on_exit = self._parse_handler_blocks(children.get('onexit', ()))
+        if on_exit:
+            state.on_exit = on_exit
+
+        return state
+
+    def _parse_transitions(self, trans_elems) -> List[Transition]:
+        """Parse a state's <transition> children and collect their events"""
+        transitions = []
+        for trans_elem in trans_elems:
+            transition = self._parse_transition(trans_elem)
+            transitions.append(transition)
+            self._transitions_by_target.setdefault(transition.target, []).append(transition)
+
+            # Collect event names
+            if transition.event:
+                self._collect_transition_events(transition.event)
+        return transitions
+
+    def _parse_handler_blocks(self, handler_elems) -> List[Dict]:
+        """Concatenate the actions of a state's <onentry> or <onexit> children (W3C SCXML 3.8, 3.9)"""
+        actions = []
+        for handler_elem in handler_elems:
+            actions.extend(self._parse_executable_content(handler_elem))
+        return actions
+
+    def _parse_history(self, history_elem, parent_id: Optional[str]):
+        """
+        Parse <history> element (W3C SCXML 3.11)
+
+        Returns:
+            (history_id, info) with parent, type and default_target, or None
+            if the history state has no default transition
+        """
+        history_id = history_elem.get('id')
+        history_type = history_elem.get('type', 'shallow')  # W3C SCXML 3.11: shallow or deep
+
+        # W3C SCXML 3.11: History states have default transitions
+        # Extract the default target from the history's transition element
+        default_target = None
+        for trans_elem in ns_findall(history_elem, 'transition'):
+            target = trans_elem.get('target')
+            if target:
+                default_target = target
+                break  # Use first transition as default
+
+        if not default_target:
+            return None
+
+        # Store comprehensive history state information
+        # Leaf target will be resolved later in _resolve_history_targets()
+        return history_id, {
+            'parent': parent_id,  # Parent compound state
+            'type': history_type,  # shallow or deep
+            'default_target': default_target  # Default transition target
+        }
+
+    def _add_event(self, event: str):
+        """
+        Add an event name to the event enum
+
+        Names are interned so repeated adds and later lookups against state ids
+        and transition targets compare by identity first.
+        """
+        self.model.events.add(sys.intern(event))
+
+    def _collect_transition_events(self, event_attr: str):
+        """
+        Add a transition's event descriptors to the event enum
+
+        W3C SCXML 5.9.3: Wildcards (*) and patterns (foo.*) are skipped; they are
+        handled by EventMatchingHelper at runtime
+        """
+        if event_attr in _WILDCARDS:
+            return
+        # Handle multiple events (e.g., "event1 event2"); a single descriptor
+        # without any whitespace skips the split() allocation
+        if ' ' not in event_attr and event_attr.isprintable():
+            events = (event_attr,)
+        else:
+            events = event_attr.split()
+        # Regular events go to the enum in one C-level bulk update
+        self.model.events.update(
+            sys.intern(event) for event in events
+            if event not in _WILDCARDS and not event.endswith('.*'))
 
     def _parse_transition(self, trans_elem) -> Transition:
         """Parse <transition> element (W3C SCXML 3.3)"""
@@ -568,12 +936,12 @@ class SCXMLParser:
             cond_cpp = self._convert_in_to_cpp(cond)
         
         transition = Transition(
-            event=trans_elem.get('event', ''),
-            target=trans_elem.get('target', ''),
+            event=sys.intern(trans_elem.get('event', '')),
+            target=sys.intern(trans_elem.get('target', '')),
             cond=cond,
             cond_cpp=cond_cpp,
             is_pure_in_predicate=is_pure_in,
-            type=trans_elem.get('type', 'external')
+            type=sys.intern(trans_elem.get('type', 'external'))
         )
 
         # Parse executable content
@@ -591,225 +959,194 @@ class SCXMLParser:
         Parse executable content (actions) from SCXML element
 
         Handles: raise, send, assign, if, foreach, log, script, cancel
+
+        Args:
+            parent_elem: Element whose children are the actions, or any iterable of
+                action elements (e.g. one <if> branch)
         """
         actions = []
+        handlers = self._ACTION_HANDLERS
 
         for child in parent_elem:
             # Skip text nodes and comments
             if not isinstance(child.tag, str):
                 continue
             # Use localname to strip namespace
-            tag = etree.QName(child).localname
+            tag = _localname(child.tag)
             action = {'type': tag}
 
-            if tag == 'raise':
-                # W3C SCXML 3.8.1: <raise>
-                action['event'] = child.get('event', '')
-                self.model.events.add(action['event'])
-
-            elif tag == 'send':
-                # W3C SCXML 6.2: <send>
-                action['event'] = child.get('event', '')
-                action['eventexpr'] = child.get('eventexpr', '')
-                action['target'] = child.get('target', '')
-                action['targetexpr'] = child.get('targetexpr', '')
-                
-                # W3C SCXML 6.2: Detect parent communication (<send target="#_parent">)
-                if action['target'] == '#_parent':
-                    self.model.has_parent_communication = True
-                # W3C SCXML 6.4.1: Detect child communication (<send target="#_child">)
-                elif action['target'] == '#_child':
-                    self.model.has_child_communication = True
-                action['send_type'] = child.get('type', '')  # Renamed from 'type' to avoid conflict
-                action['delay'] = child.get('delay', '')
-                action['delayexpr'] = child.get('delayexpr', '')
-                action['id'] = child.get('id', '')
-                action['idlocation'] = child.get('idlocation', '')
-                action['namelist'] = child.get('namelist', '')  # W3C SCXML C.1: namelist for event data
-
-                # Parse <param> children
-                action['params'] = []
-                for param in ns_findall(child, 'param'):
-                    action['params'].append({
-                        'name': param.get('name'),
-                        'expr': param.get('expr', ''),
-                        'location': param.get('location', '')
-                    })
-
-                # Parse <content>
-                content_elems = ns_findall(child, 'content')
-                if content_elems:
-                    content_elem = content_elems[0]
-                    action['content'] = content_elem.text or ''
-                    action['contentexpr'] = content_elem.get('expr', '')
-                else:
-                    action['content'] = ''
-                    action['contentexpr'] = ''
+            handler = handlers.get(tag)
+            if handler is not None:
+                handler(self, child, action)
 
-                # Detect dynamic expressions
-                if action['eventexpr'] or action['targetexpr'] or action['delayexpr']:
-                    self.model.has_dynamic_expressions = True
-                    self.model.needs_jsengine = True
+            actions.append(action)
 
-                # W3C SCXML C.1 (test 496): targetexpr may result in unreachable target → error.communication
-                if action['targetexpr']:
-                    self.model.events.add('error.communication')
+        return actions
 
-                if action['event']:
-                    self.model.events.add(action['event'])
+    def _parse_raise_action(self, child, action: Dict):
+        """Parse <raise> action (W3C SCXML 3.8.1)"""
+        action['event'] = child.get('event', '')
+        self._add_event(action['event'])
+
+    def _parse_send_action(self, child, action: Dict):
+        """Parse <send> action (W3C SCXML 6.2)"""
+        # Start from the defaults and overwrite only the attributes actually present
+        action.update(_SEND_DEFAULTS)
+        for name, value in child.attrib.items():
+            key = _SEND_ATTR_KEYS.get(name)
+            if key is not None:
+                action[key] = value
+
+        # W3C SCXML 6.2: Detect parent communication (<send target="#_parent">)
+        if action['target'] == '#_parent':
+            self.model.has_parent_communication = True
+        # W3C SCXML 6.4.1: Detect child communication (<send target="#_child">)
+        elif action['target'] == '#_child':
+            self.model.has_child_communication = True
+
+        # Parse <param> children and the first <content> in one pass
+        params = action['params'] = []
+        content_elem = None
+        for sub in child.iterchildren(_SC_PARAM, _SC_CONTENT):
+            if sub.tag == _SC_PARAM:
+                params.append({
+                    'name': sub.get('name'),
+                    'expr': sub.get('expr', ''),
+                    'location': sub.get('location', '')
+                })
+            elif content_elem is None:
+                content_elem = sub
 
-            elif tag == 'assign':
-                # W3C SCXML 5.4: <assign>
-                action['location'] = child.get('location', '')
-                action['expr'] = child.get('expr', '')
+        if content_elem is not None:
+            action['content'] = content_elem.text or ''
+            action['contentexpr'] = content_elem.get('expr', '')
+        else:
+            action['content'] = ''
+            action['contentexpr'] = ''
+
+        # Detect dynamic expressions
+        if action['eventexpr'] or action['targetexpr'] or action['delayexpr']:
+            self.model.has_dynamic_expressions = True
+            self.model.needs_jsengine = True
 
-                # W3C SCXML 5.3: All assignments in ECMAScript datamodel require JSEngine
-                # This matches C++ generator behavior
-                self.model.needs_jsengine = True
+        # W3C SCXML C.1 (test 496): targetexpr may result in unreachable target → error.communication
+        if action['targetexpr']:
+            self.model.events.add('error.communication')
 
-            elif tag == 'if':
-                # W3C SCXML 3.12.1: <if><elseif><else> with complex sibling structure
-                # Actions after <if> but before <elseif>/<else> are the "then" branch
-                # Actions after <elseif> but before next <elseif>/<else> are elseif branches
-                # Actions after <else> until </if> are else branch
+        if action['event']:
+            self._add_event(action['event'])
 
-                cond = child.get('cond', '')
-                # W3C SCXML 5.9.2: Check if condition is pure In() predicate
-                is_pure_in = False
-                cond_cpp = ''
-                if cond and self._is_pure_in_predicate(cond):
-                    is_pure_in = True
-                    cond_cpp = self._convert_in_to_cpp(cond)
-
-                action['cond'] = cond
-                action['cond_cpp'] = cond_cpp
-                action['is_pure_in_predicate'] = is_pure_in
-                action['elseif_branches'] = []
-                action['else_actions'] = []
-                
-                # Collect all children (if block content + elseif/else markers)
-                children = list(child)
-                action['then_actions'] = []
-                current_branch = action['then_actions']
-                
-                i = 0
-                while i < len(children):
-                    elem = children[i]
-                    # Skip text nodes and comments
-                    if not isinstance(elem.tag, str):
-                        i += 1
-                        continue
-                    elem_tag = etree.QName(elem).localname
-                    
-                    if elem_tag == 'elseif':
-                        # Start new elseif branch
-                        elseif_cond = elem.get('cond', '')
-                        # W3C SCXML 5.9.2: Check if condition is pure In() predicate
-                        elseif_is_pure_in = False
-                        elseif_cond_cpp = ''
-                        if elseif_cond and self._is_pure_in_predicate(elseif_cond):
-                            elseif_is_pure_in = True
-                            elseif_cond_cpp = self._convert_in_to_cpp(elseif_cond)
-
-                        branch = {
-                            'cond': elseif_cond,
-                            'cond_cpp': elseif_cond_cpp,
-                            'is_pure_in_predicate': elseif_is_pure_in,
-                            'actions': []
-                        }
-                        action['elseif_branches'].append(branch)
-                        current_branch = branch['actions']
-                    elif elem_tag == 'else':
-                        # Start else branch
-                        current_branch = action['else_actions']
-                    else:
-                        # Regular action - add to current branch
-                        branch_action = {'type': elem_tag}
-                        
-                        # Parse based on action type
-                        if elem_tag == 'raise':
-                            branch_action['event'] = elem.get('event', '')
-                            if branch_action['event']:
-                                self.model.events.add(branch_action['event'])
-                        elif elem_tag == 'send':
-                            branch_action.update({
-                                'event': elem.get('event', ''),
-                                'target': elem.get('target', ''),
-                                'targetexpr': elem.get('targetexpr', ''),
-                                'type': elem.get('type', ''),
-                                'id': elem.get('id', ''),
-                                'idlocation': elem.get('idlocation', ''),
-                                'delay': elem.get('delay', ''),
-                                'delayexpr': elem.get('delayexpr', ''),
-                                'namelist': elem.get('namelist', ''),
-                                'params': [],
-                                'content': ''
-                            })
-                            # Parse <param> children (W3C SCXML 6.2)
-                            for param in ns_findall(elem, 'param'):
-                                branch_action['params'].append({
-                                    'name': param.get('name'),
-                                    'expr': param.get('expr', ''),
-                                    'location': param.get('location', '')
-                                })
-                            # Parse <content> (W3C SCXML 6.2)
-                            content_elems = ns_findall(elem, 'content')
-                            if content_elems:
-                                content_elem = content_elems[0]
-                                branch_action['content'] = content_elem.text or ''
-                        elif elem_tag == 'assign':
-                            branch_action.update({
-                                'location': elem.get('location', ''),
-                                'expr': elem.get('expr', '')
-                            })
-                            # W3C SCXML 5.3: All assignments require JSEngine
-                            self.model.needs_jsengine = True
-                        elif elem_tag == 'log':
-                            branch_action.update({
-                                'label': elem.get('label', ''),
-                                'expr': elem.get('expr', '')
-                            })
-                        elif elem_tag == 'script':
-                            branch_action.update({
-                                'src': elem.get('src', ''),
-                                'content': elem.text or ''
-                            })
-                            self.model.needs_jsengine = True
-                        
-                        current_branch.append(branch_action)
-                    
-                    i += 1
-                
-                if self._requires_jsengine(action['cond']):
-                    self.model.needs_jsengine = True
-
-            elif tag == 'foreach':
-                # W3C SCXML 4.6: <foreach>
-                action['array'] = child.get('array', '')
-                action['item'] = child.get('item', '')
-                action['index'] = child.get('index', '')
-                action['actions'] = self._parse_executable_content(child)
-                self.model.needs_jsengine = True
+    def _parse_assign_action(self, child, action: Dict):
+        """Parse <assign> action (W3C SCXML 5.4)"""
+        action['location'] = child.get('location', '')
+        action['expr'] = child.get('expr', '')
 
-            elif tag == 'log':
-                # W3C SCXML 3.8.8: <log>
-                action['label'] = child.get('label', '')
-                action['expr'] = child.get('expr', '')
+        # W3C SCXML 5.3: All assignments in ECMAScript datamodel require JSEngine
+        # This matches C++ generator behavior
+        self.model.needs_jsengine = True
 
-            elif tag == 'script':
-                # W3C SCXML 3.8.6: <script>
-                action['src'] = child.get('src', '')
-                action['content'] = child.text or ''
-                self.model.needs_jsengine = True
+    def _parse_if_action(self, child, action: Dict):
+        """Parse <if>/<elseif>/<else> action (W3C SCXML 3.12.1)"""
+        # Actions after <if> but before <elseif>/<else> are the "then" branch
+        # Actions after <elseif> but before next <elseif>/<else> are elseif branches
+        # Actions after <else> until </if> are else branch
+
+        cond = child.get('cond', '')
+        # W3C SCXML 5.9.2: Check if condition is pure In() predicate
+        is_pure_in = False
+        cond_cpp = ''
+        if cond and self._is_pure_in_predicate(cond):
+            is_pure_in = True
+            cond_cpp = self._convert_in_to_cpp(cond)
 
-            elif tag == 'cancel':
-                # W3C SCXML 6.2: <cancel>
-                action['sendid'] = child.get('sendid', '')
-                action['sendidexpr'] = child.get('sendidexpr', '')
+        action['cond'] = cond
+        action['cond_cpp'] = cond_cpp
+        action['is_pure_in_predicate'] = is_pure_in
+        action['elseif_branches'] = []
+        action['else_actions'] = []
 
-            actions.append(action)
+        # Split children into then/elseif/else groups at the <elseif>/<else> markers,
+        # then parse each group with the same handlers as any other executable content
+        action['then_actions'] = []
+        then_children = []
+        current_children = then_children
+        branch_children = []  # (action list to fill, children) per elseif/else branch
 
-        return actions
+        for elem in child:
+            # Skip text nodes and comments
+            if not isinstance(elem.tag, str):
+                continue
+            elem_tag = _localname(elem.tag)
+
+            if elem_tag == 'elseif':
+                # Start new elseif branch
+                elseif_cond = elem.get('cond', '')
+                # W3C SCXML 5.9.2: Check if condition is pure In() predicate
+                elseif_is_pure_in = False
+                elseif_cond_cpp = ''
+                if elseif_cond and self._is_pure_in_predicate(elseif_cond):
+                    elseif_is_pure_in = True
+                    elseif_cond_cpp = self._convert_in_to_cpp(elseif_cond)
+
+                branch = {
+                    'cond': elseif_cond,
+                    'cond_cpp': elseif_cond_cpp,
+                    'is_pure_in_predicate': elseif_is_pure_in,
+                    'actions': []
+                }
+                action['elseif_branches'].append(branch)
+                current_children = []
+                branch_children.append((branch['actions'], current_children))
+            elif elem_tag == 'else':
+                # Start else branch
+                current_children = []
+                branch_children.append((action['else_actions'], current_children))
+            else:
+                # Regular action - add to current branch
+                current_children.append(elem)
+
+        action['then_actions'] = self._parse_executable_content(then_children)
+        for branch_actions, children in branch_children:
+            branch_actions.extend(self._parse_executable_content(children))
+
+        if self._requires_jsengine(action['cond']):
+            self.model.needs_jsengine = True
+
+    def _parse_foreach_action(self, child, action: Dict):
+        """Parse <foreach> action (W3C SCXML 4.6)"""
+        action['array'] = child.get('array', '')
+        action['item'] = child.get('item', '')
+        action['index'] = child.get('index', '')
+        action['actions'] = self._parse_executable_content(child)
+        self.model.needs_jsengine = True
+
+    def _parse_log_action(self, child, action: Dict):
+        """Parse <log> action (W3C SCXML 3.8.8)"""
+        action['label'] = child.get('label', '')
+        action['expr'] = child.get('expr', '')
+
+    def _parse_script_action(self, child, action: Dict):
+        """Parse <script> action (W3C SCXML 3.8.6)"""
+        action['src'] = child.get('src', '')
+        action['content'] = child.text or ''
+        self.model.needs_jsengine = True
+
+    def _parse_cancel_action(self, child, action: Dict):
+        """Parse <cancel> action (W3C SCXML 6.2)"""
+        action['sendid'] = child.get('sendid', '')
+        action['sendidexpr'] = child.get('sendidexpr', '')
+
+    # Executable content tag -> handler filling the action dict in place
+    _ACTION_HANDLERS = {
+        'raise': _parse_raise_action,
+        'send': _parse_send_action,
+        'assign': _parse_assign_action,
+        'if': _parse_if_action,
+        'foreach': _parse_foreach_action,
+        'log': _parse_log_action,
+        'script': _parse_script_action,
+        'cancel': _parse_cancel_action,
+    }
 
     def _parse_donedata(self, donedata_elem) -> Dict:
         """Parse <donedata> element (W3C SCXML 5.5)"""
@@ -819,21 +1156,21 @@ class SCXMLParser:
             'contentexpr': ''
         }
 
-        # Parse <param> elements
-        for param_elem in ns_findall(donedata_elem, 'param'):
-            param = {
-                'name': param_elem.get('name', ''),
-                'expr': param_elem.get('expr', ''),
-                'location': param_elem.get('location', '')
-            }
-            donedata['params'].append(param)
-
-        # Parse <content> element
-        content_elem = ns_find(donedata_elem, 'content')
+        # Parse <param> elements and the first <content> in one pass
+        content_elem = None
+        for sub in donedata_elem.iterchildren(_SC_PARAM, _SC_CONTENT):
+            if sub.tag == _SC_PARAM:
+                donedata['params'].append({
+                    'name': sub.get('name', ''),
+                    'expr': sub.get('expr', ''),
+                    'location': sub.get('location', '')
+                })
+            elif content_elem is None:
+                content_elem = sub
+
         if content_elem is not None:
             donedata['contentexpr'] = content_elem.get('expr', '')
-            if content_elem.text:
-                donedata['content'] = content_elem.text.strip()
+            donedata['content'] = _text(content_elem)
 
         return donedata
 
@@ -853,14 +1190,14 @@ class SCXMLParser:
         }
 
         # Parse inline content
-        content_elem = invoke_elem.find('{http://www.w3.org/2005/07/scxml}content')
+        content_elem = invoke_elem.find(_SC_CONTENT)
         if content_elem is not None:
             # Check for expr attribute (dynamic content expression)
             contentexpr = content_elem.get('expr', '')
             invoke['contentexpr'] = contentexpr
 
             # Check for inline SCXML child element (static content)
-            child_scxml = content_elem.find('{http://www.w3.org/2005/07/scxml}scxml')
+            child_scxml = content_elem.find(_SC_SCXML)
             if child_scxml is not None:
                 # Store inline SCXML element for later extraction
                 invoke['content_scxml'] = child_scxml
@@ -870,7 +1207,7 @@ class SCXMLParser:
                 invoke['has_inline_scxml'] = False
 
         # Parse <param> children
-        for param in ns_findall(invoke_elem, 'param'):
+        for param in invoke_elem.iterchildren(_SC_PARAM):
             invoke['params'].append({
                 'name': param.get('name'),
                 'expr': param.get('expr', ''),
@@ -878,7 +1215,7 @@ class SCXMLParser:
             })
 
         # Parse <finalize>
-        finalize_elem = invoke_elem.find('{http://www.w3.org/2005/07/scxml}finalize')
+        finalize_elem = invoke_elem.find(_SC_FINALIZE)
         if finalize_elem is not None:
             invoke['finalize'] = self._parse_executable_content(finalize_elem)
 
@@ -928,27 +1265,15 @@ class SCXMLParser:
         if not expr or 'In(' not in expr:
             return False
         
-        import re
-        
         # W3C SCXML B.1: XML entity escaping - convert back for parsing
         # &amp;&amp; → &&, &amp;| → ||
-        clean_expr = expr.replace('&amp;&amp;', '&&').replace('&amp;|', '||').strip()
-        
-        # Pattern: Only In('...') with optional &&, ||, (, ), whitespace
-        # In('state') with single quotes and static string literals only
-        # Reject: In(var), In("state"), In(`state`)
-        pattern = r"^[\s()&|]*(?:In\('[^']+'\)[\s()&|]*)+$"
+        clean_expr = _unescape_logical_ops(expr).strip()
         
-        if not re.match(pattern, clean_expr):
+        if not _PURE_IN_PREDICATE_RE.match(clean_expr):
             return False
         
-        # Additional validation: No ECMAScript keywords
-        ecma_keywords = ['typeof', '_event', 'function', 'var', 'let', 'const', 'return']
-        for keyword in ecma_keywords:
-            if keyword in clean_expr:
-                return False
-        
-        return True
+        # Additional validation: No ECMAScript keywords (one scan, only after a match)
+        return not _IN_PREDICATE_ECMA_RE.search(clean_expr)
     
     def _convert_in_to_cpp(self, expr: str) -> str:
         """
@@ -968,14 +1293,12 @@ class SCXMLParser:
         Returns:
             C++ code with direct isStateActive() calls
         """
-        import re
-        
         # W3C SCXML B.1: XML entity escaping - convert for C++ code
-        cpp_expr = expr.replace('&amp;&amp;', '&&').replace('&amp;|', '||')
+        cpp_expr = _unescape_logical_ops(expr)
         
         # Transform: In('state') → this->isStateActive("state")
         # Use double quotes in C++ for consistency with generated code
-        cpp_expr = re.sub(r"In\('([^']+)'\)", r'this->isStateActive("\1")', cpp_expr)
+        cpp_expr = _IN_PREDICATE_RE.sub(r'this->isStateActive("\1")', cpp_expr)
         
         return cpp_expr
 
@@ -1004,44 +1327,19 @@ class SCXMLParser:
             return True
 
         # ECMAScript-specific features (excluding In() - handled above)
-        js_features = ['typeof', '_event.', 'function', 'var ', 'let ', 'const ']
-
-        for feature in js_features:
-            if feature in expr:
-                return True
-
         # W3C SCXML B.2: ECMAScript string/number literals require JSEngine for proper boolean conversion
         # Examples: 'foo' (non-empty string → true), '' (empty string → false), 0 (→ false), 1 (→ true)
         # Must use JSEngine to ensure ECMAScript semantics (test 449)
-        import re
-        # Check for string literals (single or double quotes)
-        if re.search(r"['\"]", expr):
+        # Event metadata fields all contain '_event.' and are covered by this scan
+        if _JS_EXPR_RE.search(expr):
             return True
 
-        # Check for event metadata access
-        for field in self.EVENT_METADATA_FIELDS:
-            if field in expr:
-                self.model.has_event_metadata = True
-                return True
-
         # W3C SCXML 5.9: Expressions that cannot be evaluated as boolean or cause errors
-        # Check for C++ reserved keywords that would be invalid if directly embedded in C++ code
+        # C++ reserved keywords would be invalid if directly embedded in C++ code
         # These must be evaluated by JSEngine to properly raise error.execution
-        cpp_reserved = ['return', 'break', 'continue', 'goto', 'switch', 'case', 'default',
-                        'if', 'else', 'while', 'do', 'for', 'class', 'struct', 'typedef',
-                        'using', 'namespace', 'template', 'typename', 'static', 'extern',
-                        'inline', 'virtual', 'operator', 'new', 'delete', 'this', 'throw',
-                        'try', 'catch', 'public', 'private', 'protected']
-
-        # Check if expression is exactly a reserved word or starts with reserved word followed by non-identifier char
-        expr_stripped = expr.strip()
-        for keyword in cpp_reserved:
-            # Exact match or keyword followed by non-alphanumeric (e.g., "return ", "return;")
-            if expr_stripped == keyword or (expr_stripped.startswith(keyword) and
-                                            len(expr_stripped) > len(keyword) and
-                                            not expr_stripped[len(keyword)].isalnum() and
-                                            expr_stripped[len(keyword)] != '_'):
-                return True
+        # Whole leading identifier, so "return;" matches but "returnValue" does not
+        if _LEADING_IDENT_RE.match(expr.strip()).group() in _CPP_RESERVED:
+            return True
 
         return False
 
@@ -1053,29 +1351,33 @@ class SCXMLParser:
         - Removes "file:" prefix from src
         - Extracts basename without extension
         - Generates unique invoke IDs if not specified
-        - Detects if child needs JSEngine (for param passing)
+        - Detects if child needs JSEngine (for param passing); W3C SCXML 6.4.1: the
+          answer only decides how <param> values reach the child, so param-less
+          invokes skip the probe and keep child_needs_jsengine False
         - NEW: Extracts inline <content><scxml>...</scxml></content> to separate files
         """
-        from pathlib import Path
-        from lxml import etree
-
-        invoke_count = {}  # Track invoke count per state for auto-ID generation
+        invoke_count = defaultdict(int)  # Track invoke count per state for auto-ID generation
         inline_child_count = 0  # Track inline children for unique naming
+        pending_probes = []  # (static_invoke, child path) whose needs_jsengine is probed below
+        inline_probe_paths = {}  # canonical inline child digest -> first extracted path to probe
+        # Children are resolved relative to the parent document
+        parent_dir = Path(self.scxml_path).parent if getattr(self, 'scxml_path', None) else Path('.')
 
         for state in self.model.states.values():
+            # src -> static_invoke entries with that src, in declaration order
+            static_by_src = {}
+            for si in state.static_invokes:
+                static_by_src.setdefault(si['src'], []).append(si)
+
             for invoke in state.invokes:
                 if not invoke.get('is_static', False):
                     continue
 
-                # Find corresponding static_invoke entry
-                matching_static = None
-                for si in state.static_invokes:
-                    if si['src'] == invoke['src']:
-                        matching_static = si
-                        break
-
-                if not matching_static:
+                # Find corresponding static_invoke entry (first one with the same src)
+                candidates = static_by_src.get(invoke['src'])
+                if not candidates:
                     continue
+                matching_static = candidates[0]
 
                 # Handle inline <content><scxml> by extracting to separate file
                 if invoke.get('has_inline_scxml', False):
@@ -1093,25 +1395,31 @@ class SCXMLParser:
                         inline_child_count += 1
 
                     # Extract to separate file in same directory as parent
-                    parent_dir = Path(self.scxml_path).parent if hasattr(self, 'scxml_path') else Path('.')
                     child_scxml_path = parent_dir / f"{child_name}.scxml"
 
-                    # Write inline SCXML to file
-                    with open(child_scxml_path, 'w') as f:
-                        f.write('<?xml version="1.0"?>\n\n')
-                        f.write(etree.tostring(child_scxml_elem, encoding='unicode', pretty_print=True))
+                    # Write inline SCXML to file, serialized by libxml2 straight to the file
+                    etree.ElementTree(child_scxml_elem).write(
+                        str(child_scxml_path), xml_declaration=True, encoding='utf-8', pretty_print=True)
 
-                    # Update static_invoke to reference extracted file
+                    # Update static_invoke to reference extracted file; re-index it so the
+                    # next inline invoke of this state matches the next entry
+                    candidates.pop(0)
                     matching_static['src'] = f"{child_name}.scxml"
+                    static_by_src.setdefault(matching_static['src'], []).append(matching_static)
                     matching_static['child_name'] = child_name
 
-                    # Parse extracted child to detect JSEngine needs
-                    try:
-                        child_parser = SCXMLParser()
-                        child_model = child_parser.parse_file(str(child_scxml_path))
-                        matching_static['child_needs_jsengine'] = child_model.needs_jsengine
-                    except Exception:
+                    # Detect JSEngine needs from the in-memory element when it declares
+                    # data; otherwise parse the extracted child
+                    if not matching_static['params']:
+                        matching_static['child_needs_jsengine'] = False
+                    elif _DATA_DECLARATION_XPATH(child_scxml_elem):
                         matching_static['child_needs_jsengine'] = True
+                    else:
+                        # Identical inline children share one probe of the first extracted copy
+                        digest = hashlib.blake2b(
+                            etree.tostring(child_scxml_elem, method='c14n'), digest_size=16).digest()
+                        probe_path = inline_probe_paths.setdefault(digest, child_scxml_path)
+                        pending_probes.append((matching_static, probe_path))
 
                 # Handle external src (existing logic)
                 elif invoke['src']:
@@ -1122,37 +1430,59 @@ class SCXMLParser:
                         src = src[5:]
 
                     # Extract basename without extension
-                    child_name = Path(src).stem
+                    child_name = os.path.splitext(os.path.basename(src))[0]
                     matching_static['child_name'] = child_name
 
-                    # Parse child SCXML file to detect if it needs JSEngine
-                    child_needs_jsengine = False
-                    try:
-                        # Construct child SCXML path relative to parent
-                        parent_dir = Path(self.scxml_path).parent if hasattr(self, 'scxml_path') else Path('.')
-                        child_scxml_path = parent_dir / f"{child_name}.scxml"
-
-                        if child_scxml_path.exists():
-                            # Parse child to check needs_jsengine
-                            child_parser = SCXMLParser()
-                            child_model = child_parser.parse_file(str(child_scxml_path))
-                            child_needs_jsengine = child_model.needs_jsengine
-                    except Exception:
-                        # If we can't parse child, assume it needs JSEngine for safety
-                        child_needs_jsengine = True
-
-                    matching_static['child_needs_jsengine'] = child_needs_jsengine
+                    # Parse child SCXML file (relative to parent) to detect if it needs JSEngine
+                    # The probe's own stat() reports a missing child, so no exists() check first
+                    matching_static['child_needs_jsengine'] = False
+                    if matching_static['params']:
+                        pending_probes.append((matching_static, parent_dir / f"{child_name}.scxml"))
 
                 # Generate invoke ID if not specified (matches C++ generator logic)
                 if not matching_static['invoke_id']:
                     state_name = matching_static['state_name']
-                    if state_name not in invoke_count:
-                        invoke_count[state_name] = 0
+                    n = invoke_count[state_name]
+                    matching_static['invoke_id'] = f"{state_name}_invoke_{n}"
+                    invoke_count[state_name] = n + 1
+
+        # Probe child documents concurrently, each distinct file once
+        if pending_probes:
+            child_paths = list(dict.fromkeys(path for _, path in pending_probes))
+            with ThreadPoolExecutor(max_workers=min(len(child_paths), os.cpu_count() or 1)) as executor:
+                probed = dict(zip(child_paths, executor.map(self._child_needs_jsengine, child_paths)))
+            for static_invoke, child_scxml_path in pending_probes:
+                static_invoke['child_needs_jsengine'] = probed[child_scxml_path]
+
+    def _child_needs_jsengine(self, child_scxml_path: Path) -> bool:
+        """
+        Parse a child SCXML file and report whether it needs JSEngine
 
-                    matching_static['invoke_id'] = f"{state_name}_invoke_{invoke_count[state_name]}"
-                    invoke_count[state_name] += 1
+        Memoized per resolved path and file version, so a child invoked from many
+        states (or many parents) is parsed once. The file is first streamed only
+        up to its first data declaration, which settles the answer without
+        building a model. A missing child needs nothing; unparseable children are
+        assumed to need JSEngine for safety.
+        """
+        try:
+            stat = child_scxml_path.stat()
+        except (FileNotFoundError, NotADirectoryError):
+            return False
+        except OSError:
+            return True
 
-    def _resolve_deep_initial(self):
+        try:
+            key = (str(child_scxml_path.resolve()), stat.st_mtime_ns, stat.st_size)
+            needs_jsengine = SCXMLParser._child_jsengine_cache.get(key)
+            if needs_jsengine is None:
+                needs_jsengine = (_file_declares_data(child_scxml_path)
+                                  or SCXMLParser().parse_file(str(child_scxml_path)).needs_jsengine)
+                SCXMLParser._child_jsengine_cache[key] = needs_jsengine
+            return needs_jsengine
+        except Exception:
+            return True
+
+    def _resolve_deep_initial(self, initial_states: List[str]):
         """
         Resolve deep initial state (matches C++ generator behavior)
 
@@ -1167,13 +1497,14 @@ class SCXMLParser:
         - This sets model.initial to "s01" (the leaf state)
         - <scxml initial="s2p112 s2p122"> (parallel initial states)
         - This keeps the space-separated format for parallel entry
+
+        Args:
+            initial_states: model.initial split on whitespace
         """
-        if not self.model.initial:
+        if not initial_states:
             return
 
         # W3C SCXML 3.13: Check if initial contains space-separated state IDs (parallel initial states)
-        initial_states = self.model.initial.split()
-        
         if len(initial_states) > 1:
             # Multiple initial states (parallel entry)
             # Verify all states exist in model
@@ -1188,11 +1519,10 @@ class SCXMLParser:
                 initial_states = [self.model.initial]
         
         # Single initial state - resolve to leaf
-        MAX_DEPTH = 20  # Safety limit to detect cycles
         current = initial_states[0]
-        depth = 0
+        seen = set()  # Stops at the first repeated state if initial attributes form a cycle
 
-        while depth < MAX_DEPTH:
+        while current not in seen:
             # Check if current state exists
             if current not in self.model.states:
                 # Initial state not found - leave as is
@@ -1203,8 +1533,8 @@ class SCXMLParser:
             # Check if state has an initial child
             if state.initial and state.initial in self.model.states:
                 # Follow to initial child
+                seen.add(current)
                 current = state.initial
-                depth += 1
             else:
                 # Reached leaf state or final state
                 break
@@ -1212,7 +1542,7 @@ class SCXMLParser:
         # Update model.initial to the resolved leaf state
         self.model.initial = current
 
-    def _apply_parallel_initial_overrides(self):
+    def _apply_parallel_initial_overrides(self, initial_states: List[str]):
         """
         Apply parallel initial state overrides (W3C SCXML 3.13)
         
@@ -1231,13 +1561,11 @@ class SCXMLParser:
                 <state id="s2p122"/>
               </state>
             </parallel>
+
+        Args:
+            initial_states: model.initial split on whitespace
         """
-        if not self.model.initial:
-            return
-        
         # Check if initial contains space-separated states (parallel initial states)
-        initial_states = self.model.initial.split()
-        
         if len(initial_states) <= 1:
             # Single initial state - no overrides needed
             return
@@ -1281,54 +1609,72 @@ class SCXMLParser:
             leaf_target = self._resolve_to_leaf_state(default_target)
             history_info['leaf_target'] = leaf_target
 
-        # Mark transitions that target history states
-        for state in self.model.states.values():
-            for transition in state.transitions:
-                if transition.target in self.model.history_default_targets:
-                    # Add history restoration marker to transition
-                    if not hasattr(transition, 'history_target'):
-                        transition.history_target = transition.target
-                    # Keep original target for template to generate restoration logic
+        # Mark transitions that target history states, found through the target index
+        # built while parsing rather than a sweep over every state's transitions
+        for history_id in self.model.history_default_targets:
+            for transition in self._transitions_by_target.get(history_id, ()):
+                # Add history restoration marker to transition; each transition is
+                # visited once and the slot is unset until here, so no probe is needed
+                transition.history_target = transition.target
+                # Keep original target for template to generate restoration logic
         
         # W3C SCXML 3.11: Resolve state.initial if it points to history state
-        # This handles <initial><transition target="h1"/></initial> where h1 is a history state
+        # This handles <initial><transition target="h1"/></initial> where h1 is a history state.
+        # history_states is keyed like history_default_targets, so one lookup does both
+        history_states = self.model.history_states
         for state in self.model.states.values():
-            if state.initial in self.model.history_default_targets:
+            history_info = history_states.get(state.initial)
+            if history_info is not None:
                 # Replace history state ID with its default target's leaf state
-                history_info = self.model.history_states[state.initial]
-                leaf_target = history_info['leaf_target']
-                state.initial = leaf_target
+                state.initial = history_info['leaf_target']
 
     def _resolve_to_leaf_state(self, state_id: str) -> str:
         """
         Resolve a state ID to its leaf state by following initial attributes
 
+        Results are memoized in self._leaf_cache: every state on an acyclic chain
+        resolves to the same leaf, so shared chain suffixes are walked once.
+
         Args:
             state_id: State ID to resolve
 
         Returns:
             Leaf state ID (atomic state with no initial attribute)
         """
-        MAX_DEPTH = 20  # Safety limit
+        cached = self._leaf_cache.get(state_id)
+        if cached is not None:
+            return cached
+
         current = state_id
-        depth = 0
+        chain = set()  # States followed before reaching current; a repeat means a cycle
+
+        while current not in chain:
+            cached = self._leaf_cache.get(current)
+            if cached is not None:
+                current = cached
+                break
 
-        while depth < MAX_DEPTH:
             if current not in self.model.states:
                 # State not found - return as is
-                return current
+                break
 
             state = self.model.states[current]
 
             # Check if state has an initial child
             if state.initial and state.initial in self.model.states:
                 # Follow to initial child
+                chain.add(current)
                 current = state.initial
-                depth += 1
             else:
                 # Reached leaf state (or final state, or state without initial)
                 break
+        else:
+            # Initial attributes form a cycle: stop where it closes, don't memoize
+            return current
 
+        for chain_id in chain:
+            self._leaf_cache[chain_id] = current
+        self._leaf_cache[state_id] = current
         return current
 
     def _compute_parallel_regions(self):
@@ -1340,31 +1686,10 @@ class SCXMLParser:
         """
         for state_id, state in self.model.states.items():
             if state.is_parallel:
-                # Find all direct child states
-                child_regions = []
-                for child_id, child_state in self.model.states.items():
-                    if child_state.parent == state_id:
-                        child_regions.append(child_id)
-                
-                # Sort by document order (state IDs in model.states maintain insertion order)
+                # Direct child states, already in model.states insertion order
+                child_regions = list(self.model.state_children.get(state_id, ()))
                 self.model.parallel_regions[state_id] = child_regions
 
-    def _detect_transition_actions(self):
-        """
-        Detect if any transitions have executable content (W3C SCXML 3.13)
-        
-        Sets has_transition_actions flag for conditional static optimization.
-        If no transitions have actions, tryTransitionInState can remain static.
-        """
-        for state in self.model.states.values():
-            for transition in state.transitions:
-                if transition.actions:
-                    self.model.has_transition_actions = True
-                    return  # Early exit once we find any action
-        
-        # No transition actions found
-        self.model.has_transition_actions = False
-
     def _add_done_state_events(self):
         """
         Add done.state events for states with final children (W3C SCXML 3.7)
@@ -1379,16 +1704,36 @@ class SCXMLParser:
                 continue
 
             # Check if this state has any final children
-            has_final_child = False
-            for child_id, child_state in self.model.states.items():
-                if child_state.parent == state_id and child_state.is_final:
-                    has_final_child = True
-                    break
+            has_final_child = any(
+                self.model.states[child_id].is_final
+                for child_id in self.model.state_children.get(state_id, ()))
 
             # If state has final children, add done.state.{state_id} event
             if has_final_child:
                 done_event = f"done.state.{state_id}"
-                self.model.events.add(done_event)
+                self._add_event(done_event)
+
+    def _scan_transitions(self):
+        """
+        Check every transition once for event metadata guards and executable content
+
+        W3C SCXML 3.13: If no transition has actions, tryTransitionInState can
+        remain static. The scan stops as soon as both answers are known.
+
+        Returns:
+            (has_event_metadata, has_transition_actions)
+        """
+        event_metadata_re = self._EVENT_METADATA_RE
+        has_event_metadata = has_transition_actions = False
+        for state in self.model.states.values():
+            for transition in state.transitions:
+                if not has_transition_actions and transition.actions:
+                    has_transition_actions = True
+                if not has_event_metadata and transition.cond and event_metadata_re.search(transition.cond):
+                    has_event_metadata = True
+                if has_event_metadata and has_transition_actions:
+                    return True, True
+        return has_event_metadata, has_transition_actions
 
     def _detect_features(self):
         """
@@ -1399,16 +1744,13 @@ class SCXMLParser:
         - has_parallel_states
         - has_invoke
         - has_event_metadata
+        - has_transition_actions
         - needs_jsengine
         """
-        # Check for event metadata in guards
-        for state in self.model.states.values():
-            for transition in state.transitions:
-                if transition.cond:
-                    for field in self.EVENT_METADATA_FIELDS:
-                        if field in transition.cond:
-                            self.model.has_event_metadata = True
-                            self.model.needs_jsengine = True
+        has_event_metadata, self.model.has_transition_actions = self._scan_transitions()
+        if has_event_metadata:
+            self.model.has_event_metadata = True
+            self.model.needs_jsengine = True
 
         # Summary
         return {
@@ -1421,9 +1763,16 @@ class SCXMLParser:
         }
 
 
-if __name__ == '__main__':
-    import sys
+def _parse_one(scxml_path: str) -> SCXMLModel:
+    """Process pool worker for SCXMLParser.parse_files()"""
+    model = SCXMLParser().parse_file(scxml_path)
+    for state in model.states.values():
+        for invoke in state.invokes:
+            invoke.pop('content_scxml', None)
+    return model
+
 
+if __name__ == '__main__':
     if len(sys.argv) < 2:
         print("Usage: python scxml_parser.py <scxml_file>")
         sys.exit(1)
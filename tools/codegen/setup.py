@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Optional Cython build for the SCXML parser
+
+scxml_parser.py stays the source of truth; this compiles it unchanged into a
+C extension that Python picks up ahead of the .py when built in place:
+
+    cd tools/codegen && python3 setup.py build_ext --inplace
+
+Set SCXML_CYTHON=0 (or build without Cython installed) to skip compilation
+and keep running the pure-Python module. Deleting the generated
+scxml_parser.*.so reverts to the .py as well.
+"""
+
+import os
+from setuptools import setup
+
+
+def _cython_enabled():
+    """Compile unless explicitly disabled via SCXML_CYTHON"""
+    return os.environ.get('SCXML_CYTHON', '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+ext_modules = []
+if _cython_enabled():
+    try:
+        from Cython.Build import cythonize
+    except ImportError:
+        print("Cython not available, using pure-Python scxml_parser")
+    else:
+        ext_modules = cythonize(
+            ['scxml_parser.py'],
+            language_level=3,
+            compiler_directives={
+                'boundscheck': False,
+                'wraparound': False,
+                # Keep introspectable Python functions (dataclasses, tracebacks)
+                'binding': True,
+            },
+        )
+
+setup(
+    name='rsm-scxml-parser',
+    py_modules=['scxml_parser'],
+    ext_modules=ext_modules,
+)
@@ -3,33 +3,52 @@
 Fix SCXML file name attribute - remove name from first <scxml> and add test name
 Usage: fix_scxml_name.py <scxml_file> <test_name>
 """
-import sys
+import os
 import re
+import shutil
+import sys
+import tempfile
 
-def fix_scxml_name(scxml_path, test_name):
-    with open(scxml_path, 'r') as f:
-        content = f.read()
-
-    # Find first <scxml> tag (up to '>') and remove any name attribute
-    first_scxml_match = re.search(r'<scxml[^>]*?>', content, flags=re.DOTALL)
-    if not first_scxml_match:
-        return  # No <scxml> tag found
-
-    first_scxml = first_scxml_match.group(0)
-    start_pos = first_scxml_match.start()
-    end_pos = first_scxml_match.end()
-
-    # Remove name attribute from first <scxml> tag
-    fixed_scxml = re.sub(r'\s+name="[^"]*"', '', first_scxml)
+# First <scxml> opening tag (up to '>') and the name attributes inside it
+_SCXML_TAG_RE = re.compile(rb'<scxml[^>]*?>')
+_NAME_ATTR_RE = re.compile(rb'\s+name="[^"]*"')
 
-    # Add new name attribute after <scxml
-    fixed_scxml = fixed_scxml.replace('<scxml', f'<scxml name="{test_name}"', 1)
+# The root tag sits at the top of the document, so it is found in the first chunk
+_CHUNK_SIZE = 4096
 
-    # Replace first <scxml> tag in content
-    content = content[:start_pos] + fixed_scxml + content[end_pos:]
 
-    with open(scxml_path, 'w') as f:
-        f.write(content)
+def fix_scxml_name(scxml_path, test_name):
+    with open(scxml_path, 'rb') as src:
+        # Read only until the first <scxml> tag is complete
+        head = bytearray()
+        while True:
+            chunk = src.read(_CHUNK_SIZE)
+            head += chunk
+            first_scxml_match = _SCXML_TAG_RE.search(head)
+            if first_scxml_match:
+                break
+            if not chunk:
+                return  # No <scxml> tag found
+
+        # Remove name attribute from first <scxml> tag
+        fixed_scxml = _NAME_ATTR_RE.sub(b'', first_scxml_match.group(0))
+
+        # Add new name attribute after <scxml
+        fixed_scxml = fixed_scxml.replace(b'<scxml', b'<scxml name="' + test_name.encode() + b'"', 1)
+
+        # Write the edited header, stream the rest of the file after it, then swap it in
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(scxml_path)))
+        try:
+            with os.fdopen(fd, 'wb') as dst:
+                dst.write(head[:first_scxml_match.start()])
+                dst.write(fixed_scxml)
+                dst.write(head[first_scxml_match.end():])
+                shutil.copyfileobj(src, dst)
+            shutil.copymode(scxml_path, tmp_path)
+            os.replace(tmp_path, scxml_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
 
 if __name__ == '__main__':
     if len(sys.argv) != 3: